@@ -1,50 +1,78 @@
 import math
 import sys
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import pygame
 from pygame import Rect, Surface
 from pygame.math import Vector2
-import csv
 import os
-from powerups import Powerup, HeartPowerup, HomingBulletPowerup, DoubleShotPowerup, ShieldPowerup, random_powerup
+from powerups import Powerup, HeartPowerup, HomingBulletPowerup, DoubleShotPowerup, ShieldPowerup, random_powerup, \
+    POWERUP_CLASSES
+from spatial import SpatialHash, sweep_rect
+from camera import Camera
+from bullet_engine import BulletEngine
+from replay import Replay, ReplayRecorder
+from tournament import MatchResult, Tournament
+from controllers import AIController, KeyboardController, RandomBot, UP, DOWN, LEFT, RIGHT, SHOOT
+from maps import CompiledMap, GameMap, POWERUP_SIZE
+from free_space import FreeSpace
+from effects import EFFECTS, EffectScheduler
+from visibility import Visibility
+from scoreboard import RANKINGS, Scoreboard, ScoreWriter
 import random
-
-def save_score_to_csv(self):
-    filename = "player_scores_1.0.csv"
-    file_exists = os.path.isfile(filename)
-
-    # Load existing scores
-    scores = {}
-    if file_exists:
-        with open(filename, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                scores[row["Player"]] = {
-                    "Rank Points": int(row["Rank Points"]),
-                    "Net Score": int(row["Net Score"])
-                }
-
-    winner = self.winner.name
-    loser = self.get_other_tank(self.winner).name
-    remaining_hp = self.winner.hp
-
-    for name in [winner, loser]:
-        if name not in scores:
-            scores[name] = {"Rank Points": 0, "Net Score": 0}
-
-    scores[winner]["Rank Points"] += 3
-    scores[winner]["Net Score"] += remaining_hp
-
-    with open(filename, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["Player", "Rank Points", "Net Score"])
-        writer.writeheader()
-        for name, data in scores.items():
-            writer.writerow({"Player": name, "Rank Points": data["Rank Points"], "Net Score": data["Net Score"]})
+import struct
+import time
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from functools import partial
+from itertools import chain
+
+def update_scoreboard(results, path=None):
+    """Apply many match results in one scoreboard transaction.
+
+    results: (player1, player2, winner name or None for a draw, winner's remaining hp)"""
+    board = Scoreboard(path or Settings.SCOREBOARD_PATH)
+    try:
+        board.record(results)
+    finally:
+        board.close()
+
+
+def import_legacy_scores(path=None):
+    #Fold the old CSV boards into the scoreboard; Scoreboard.import_csv() skips files it already took
+    board = Scoreboard(path or Settings.SCOREBOARD_PATH)
+    try:
+        for filename in Settings.LEGACY_SCORE_FILES:
+            board.import_csv(filename)
+    finally:
+        board.close()
 
 
 class Settings:
-    WIDTH, HEIGHT = 1200, 900
-    FPS = 60
+    WIDTH, HEIGHT = 1200, 900  # window
+    # Map files (see maps.py) per difficulty, in MAP_DIR next to this file; MAP_FILE plays one map at every difficulty
+    MAP_DIR = "maps"
+    MAPS = ("easy.json", "medium.json", "hard.json")
+    MAP_FILE = None
+    # Compiled maps (obstacle index, nav grid, spawn cells), memory-mapped instead of rebuilt on later runs
+    MAP_CACHE_DIR = "map_cache"
+    # The world, independent of the window; a bigger world scrolls under the camera.
+    # None is the map's own size, a bigger world repeats the map tile by tile.
+    WORLD_WIDTH, WORLD_HEIGHT = None, None
+    # "shared": one camera following both players, "split": side-by-side views, one per player
+    CAMERA_MODE = "shared"
+    SPLIT_COLOR = (40, 40, 40)  # gap between split-screen views
+    FPS = 60  # render rate
+    TICK_RATE = 60  # fixed game logic rate, independent of FPS
+    MAX_FRAME_TIME = 0.25  # seconds of logic caught up after a stall, at most
+
+    # SQLite scoreboard (see scoreboard.py); the old CSV boards are imported into it once, at startup
+    SCOREBOARD_PATH = "player_scores.db"
+    LEGACY_SCORE_FILES = ("player_scores.csv", "player_scores_1.0.csv")
+
+    # Record every match's inputs to REPLAY_DIR (see replay.py)
+    RECORD_REPLAYS = False
+    REPLAY_DIR = "replays"
+    REPLAY_SNAPSHOT_INTERVAL = 600  # ticks between keyframes used for seeking
     BG_COLOR = (255, 255, 255)
     OBSTACLE_COLOR = (100, 100, 100)
     BLACK = (0, 0, 0)
@@ -54,14 +82,50 @@ class Settings:
     TANK_HEIGHT = 75
     TANK_SPEED = 15
     TANK_HP = 10
+    # Tanks per match, 2 to MAX_TANKS: the two players, then AIController bots
+    TANK_COUNT = 2
+    MAX_TANKS = 64
+    # 0 is free-for-all; otherwise tanks are dealt round-robin into this many teams
+    TEAM_COUNT = 0
+    PLAYER_COLORS = ((0, 0, 255), (0, 255, 0))
+    TEAM_COLORS = ((0, 0, 255), (0, 255, 0), (220, 20, 60), (255, 165, 0), (128, 0, 128), (0, 160, 160))
 
     BULLET_SIZE = 12
     BULLET_SPEED = 15
     BULLET_COOLDOWN = 20
     HIT_COOLDOWN = 30
 
+    # Powerups spawn on a random free spot (see free_space.py) inside the safe zone and this far from every tank.
+    # Off, up to 50 random spots are tried and the spawn is skipped if all of them hit a wall,
+    # which is how replays recorded before free-space spawning play back.
+    FREE_SPACE_SPAWNS = True
+    POWERUP_TANK_CLEARANCE = 100
+
     FONT_NAME = None
     FONT_SIZE = 48
+    TEXT_CACHE_SIZE = 256
+
+    # Grid cell size of the collision broadphase (see spatial.py)
+    SPATIAL_CELL_SIZE = 100
+    # Cell size of the grid AI tanks path-find over (see navigation.py)
+    NAV_CELL_SIZE = 25
+    # Line-of-sight table cell size, and where tables are kept between runs (see visibility.py)
+    VISIBILITY_CELL_SIZE = 100
+    VISIBILITY_CACHE_DIR = "visibility_cache"
+    # The table grows with the square of the cell count; bigger maps test segments directly
+    VISIBILITY_MAX_CELLS = 256
+
+    # Simulate bullets in NumPy arrays (bullet_engine.py) instead of Bullet objects, if numpy is installed
+    NUMPY_BULLETS = False
+    # Test bullets along the whole segment they moved this frame so fast bullets can't tunnel
+    SWEPT_COLLISION = True
+
+    # Above either limit Game.present() flips the whole screen instead of dirty rects
+    DIRTY_RECT_LIMIT = 64
+    DIRTY_AREA_LIMIT = 0.5
+
+    # 0 caches each exact angle; N > 0 snaps angles into N rotation buckets
+    ROTATION_BUCKETS = 0
 
 
 def load_font(size: int) -> pygame.font.Font:
@@ -73,6 +137,26 @@ def load_font(size: int) -> pygame.font.Font:
     return load_font.cache[size]
 
 
+def render_text(size: int, text: str, color: Tuple[int, int, int], antialias: bool = True) -> Surface:
+    # Bounded LRU of rendered text so constant labels are rasterized once, not every frame
+    if not hasattr(render_text, "cache"):
+        render_text.cache = OrderedDict()
+        render_text.hits = 0
+        render_text.misses = 0
+    key = (size, text, antialias, tuple(color))
+    surf = render_text.cache.get(key)
+    if surf is not None:
+        render_text.hits += 1
+        render_text.cache.move_to_end(key)
+        return surf
+    render_text.misses += 1
+    surf = load_font(size).render(text, antialias, color)
+    render_text.cache[key] = surf
+    if len(render_text.cache) > Settings.TEXT_CACHE_SIZE:
+        render_text.cache.popitem(last=False)
+    return surf
+
+
 class Collider:
     def __init__(self, rect: Rect):
         super().__init__()
@@ -86,8 +170,8 @@ class Obstacle(Collider):
     def __init__(self, x: int, y: int, w: int, h: int):
         super().__init__(Rect(x, y, w, h))
 
-    def draw(self, surf: Surface):
-        pygame.draw.rect(surf, Settings.OBSTACLE_COLOR, self.rect)
+    def draw(self, surf: Surface, offset=(0, 0)):
+        pygame.draw.rect(surf, Settings.OBSTACLE_COLOR, self.rect.move(offset))
 
 
 class Bullet(Collider):
@@ -96,9 +180,11 @@ class Bullet(Collider):
         self.vel = direction * Settings.BULLET_SPEED
         self.target = target
         super().__init__(Rect(pos.x, pos.y, Settings.BULLET_SIZE, Settings.BULLET_SIZE))
+        self.prev_rect = self.rect.copy()
 
     def update(self):
-        if self.target:
+        self.prev_rect = self.rect.copy()
+        if self.target and not self.target.destroyed:
             dir_to_target = Vector2(self.target.rect.center) - Vector2(self.rect.center)
             if dir_to_target.length_squared() > 0:
                 dir_to_target = dir_to_target.normalize()
@@ -106,58 +192,99 @@ class Bullet(Collider):
         self.rect.x += self.vel.x
         self.rect.y += self.vel.y
 
-    def draw(self, surf: Surface):
-        pygame.draw.rect(surf, self.color, self.rect)
+    def draw(self, surf: Surface, offset=(0, 0)) -> Rect:
+        return pygame.draw.rect(surf, self.color, self.rect.move(offset))
+
+    def sweep(self, rect: Rect) -> Optional[float]:
+        # Earliest fraction of this frame's move at which the bullet touches rect
+        if Settings.SWEPT_COLLISION:
+            start = self.prev_rect
+            dx, dy = self.rect.x - start.x, self.rect.y - start.y
+        else:
+            start, dx, dy = self.rect, 0, 0
+        return sweep_rect(start.x, start.y, dx, dy, start.width, rect)
+
+    def swept_rect(self) -> Rect:
+        # Area covered by the bullet during this frame's move
+        return self.rect.union(self.prev_rect) if Settings.SWEPT_COLLISION else self.rect
 
-    def is_off_screen(self) -> bool:
-        r = self.rect
-        return r.right < 0 or r.left > Settings.WIDTH or r.bottom < 0 or r.top > Settings.HEIGHT
+    def is_out_of_world(self) -> bool:
+        r, world = self.rect, Game.instance().world_rect
+        return r.right < world.left or r.left > world.right or r.bottom < world.top or r.top > world.bottom
 
 
 class Tank(Collider):
     tank_images = {}
+    # (sprite, width, height) -> {angle: rotated surface}
+    rotation_cache = {}
+    # handle_input only produces these eight headings
+    PRESET_ANGLES = (0, 45, 90, 135, 180, 225, 270, 315)
 
-    def __init__(self, pos: Vector2, color: Tuple[int, int, int], controls: dict, name: str, player_index: int):
+    def __init__(self, pos: Vector2, color: Tuple[int, int, int], controls: Optional[dict], name: str,
+                 player_index: int, team: Optional[int] = None):
         self.name = name
         self.color = color
         self.controls = controls
+        # Anything with a controls() method; AI tanks get an AIController in Game.restart()
+        self.controller = KeyboardController(controls) if controls else None
+        self.team = player_index if team is None else team
+        self.out_frame = None  # tick the tank was destroyed on (see Game.knock_out), None while in play
         self.hp = Settings.TANK_HP
         self.score = 0
         self.angle = 0
         self.bullets = []
         self._reload_timer = 0
         self._hit_timer = 0
+        self.effects = {}  # name -> Effect on this tank, put on and taken off by Game.effects
         self.outside_safezone_cooldown = 0
         self.is_draw = False
-        if player_index not in Tank.tank_images:
-            if player_index == 0:
-                image_path = "Player1_tank.png"
-            else:
-                image_path = "Player2_tank.png"
-
+        self.player_index = player_index
+        # Bots share the player 1 sprite recolored to their own color, so the color is their image key
+        self.sprite = player_index if player_index < 2 else tuple(color)
+        if self.sprite not in Tank.tank_images:
             try:
-                Tank.tank_images[player_index] = pygame.image.load(image_path).convert_alpha()
-            except pygame.error:
+                image = pygame.image.load("Player2_tank.png" if player_index == 1 else "Player1_tank.png")
+                # convert_alpha() needs a display mode, which headless games never set
+                if pygame.display.get_surface() is not None:
+                    image = image.convert_alpha()
+                if player_index >= 2:
+                    # Keep the sprite's alpha, replace its colors
+                    image = image.copy()
+                    image.fill((0, 0, 0, 255), special_flags=pygame.BLEND_RGBA_MIN)
+                    image.fill((*color, 0), special_flags=pygame.BLEND_RGBA_ADD)
+                Tank.tank_images[self.sprite] = image
+            except (pygame.error, FileNotFoundError):
                 surf = pygame.Surface((Settings.TANK_WIDTH, Settings.TANK_HEIGHT))
                 surf.fill(self.color)
-                Tank.tank_images[player_index] = surf
+                Tank.tank_images[self.sprite] = surf
 
         self.original_image = pygame.transform.scale(
-            Tank.tank_images[player_index], (Settings.TANK_WIDTH, Settings.TANK_HEIGHT)
+            Tank.tank_images[self.sprite], (Settings.TANK_WIDTH, Settings.TANK_HEIGHT)
         )
+        self.rotated_images = self._build_rotation_cache()
         self.image = self.original_image
         rect = self.original_image.get_rect(center=pos)
         super().__init__(rect)
 
-    def handle_input(self, keys):
+    @property
+    def destroyed(self) -> bool:
+        return self.out_frame is not None
+
+    def take_hit(self):
+        # ✅ Shield protection logic
+        if not any(effect.blocks_damage for effect in self.effects.values()):
+            self.hp -= 1
+
+    def handle_input(self, controls: int):
+        # controls: this tick's bitmask from self.controller (UP, DOWN, LEFT, RIGHT, SHOOT)
         movement = Vector2(0, 0)
-        if keys[self.controls['left']]:
+        if controls & LEFT:
             movement.x -= 1
-        if keys[self.controls['right']]:
+        if controls & RIGHT:
             movement.x += 1
-        if keys[self.controls['up']]:
+        if controls & UP:
             movement.y -= 1
-        if keys[self.controls['down']]:
+        if controls & DOWN:
             movement.y += 1
         if movement.length_squared() > 0:
             movement = movement.normalize()
@@ -165,15 +292,15 @@ class Tank(Collider):
             new_rect = self.rect.copy()
             new_rect.center = new_pos
             self.angle = math.degrees(math.atan2(-movement.y, movement.x)) % 360
-            if not (0 <= new_rect.left and new_rect.right <= Settings.WIDTH and
-                    0 <= new_rect.top and new_rect.bottom <= Settings.HEIGHT):
+            game = Game.instance()
+            if not game.world_rect.contains(new_rect):
                 return
-            if not Game.instance().cheat_wall:
-                for collider in Game.instance().colliders:
-                    if collider is not self and new_rect.colliderect(collider.rect):
-                        return
+            if not game.cheat_wall:
+                if game.obstacle_hash.collides(new_rect) or game.tank_hash.collides(new_rect, ignore=self):
+                    return
             self.rect.center = new_pos
-        if keys[self.controls['shoot']] and self._reload_timer == 0:
+            game.tank_hash.update(self)
+        if controls & SHOOT and self._reload_timer == 0:
             self._shoot()
 
     def _shoot(self):
@@ -185,40 +312,39 @@ class Tank(Collider):
 
         game = Game.instance()
         if game and (game.cheat_tank_name == self.name or game.cheat_tank_name == "Both"):
-            target = game.get_other_tank(self)
+            target = game.nearest_enemy(self)
 
-        self.bullets.append(Bullet(pos, vel, self.color, target))
+        self._fire(pos, vel, target)
 
         if game and game.bullet_hack:
             for angle_offset in [-130, -75, 75, 130]:
                 offset_rad = math.radians(self.angle + angle_offset)
                 offset_vel = Vector2(math.cos(offset_rad), -math.sin(offset_rad))
-                self.bullets.append(Bullet(pos, offset_vel, self.color, target))
-
-        if hasattr(self, "double_shot_timer") and self.double_shot_timer > 0:
-            # Shoot two bullets
-            for offset_angle in [-10, 10]:
-                rad = math.radians(self.angle + offset_angle)
-                offset = Vector2(math.cos(rad), -math.sin(rad)) * 40
-                pos = Vector2(self.rect.center) + offset
-                vel = Vector2(math.cos(rad), -math.sin(rad))
-                target = None
-                if hasattr(self, "homing_bullet_timer") and self.homing_bullet_timer > 0:
-                    target = Game.instance().get_other_tank(self)
-                self.bullets.append(Bullet(pos, vel, self.color, target))
-        else:
-            # Normal single bullet
-            rad = math.radians(self.angle)
+                self._fire(pos, offset_vel, target)
+
+        # Normal single bullet, or whatever the tank's effects make of it (two for a double shot)
+        angles = (0,)
+        for effect in self.effects.values():
+            angles = effect.shot_angles(angles)
+        homing = any(effect.homing for effect in self.effects.values())
+        for offset_angle in angles:
+            rad = math.radians(self.angle + offset_angle)
             offset = Vector2(math.cos(rad), -math.sin(rad)) * 40
             pos = Vector2(self.rect.center) + offset
             vel = Vector2(math.cos(rad), -math.sin(rad))
-            target = None
-            if hasattr(self, "homing_bullet_timer") and self.homing_bullet_timer > 0:
-                target = Game.instance().get_other_tank(self)
-            self.bullets.append(Bullet(pos, vel, self.color, target))
+            target = game.nearest_enemy(self) if homing else None
+            self._fire(pos, vel, target)
 
         self._reload_timer = Settings.BULLET_COOLDOWN
 
+    def _fire(self, pos: Vector2, direction: Vector2, target=None):
+        engine = Game.instance().bullet_engine
+        if engine is not None:
+            engine.spawn(pos, direction, self.player_index, self.color,
+                         target.player_index if target else -1)
+        else:
+            self.bullets.append(Bullet(pos, direction, self.color, target))
+
     def update(self):
         if self.outside_safezone_cooldown > 0:
             self.outside_safezone_cooldown -= 1
@@ -227,102 +353,140 @@ class Tank(Collider):
         if self._hit_timer > 0:
             self._hit_timer -= 1
 
+        self.update_bullets()
+
+    def update_bullets(self):
+        # Also called for destroyed tanks, whose bullets in flight keep going until they land
+        game = Game.instance()
+        if game.bullet_engine is not None:
+            hits = game.bullet_engine.update_owner(self.player_index, game.tank_rects, game.hittable_by(self))
+            for victim in hits:
+                game.tanks[victim].take_hit()
+
         for b in self.bullets[:]:
             b.update()
-            if b.is_off_screen() or Game.instance().check_bullet_obstacle(b):
+            obstacle_time = game.sweep_bullet_obstacle(b)
+            hit = game.sweep_bullet_tank(b, self)
+            if hit is not None and (obstacle_time is None or hit[0] < obstacle_time):
+                # The tank was reached before any wall along the bullet's path
                 self.bullets.remove(b)
-            elif Game.instance().check_bullet_tank(b, self):
+                hit[1].take_hit()
+            elif obstacle_time is not None or b.is_out_of_world():
                 self.bullets.remove(b)
-                victim = Game.instance().get_other_tank(self)
-                # ✅ Shield protection logic
-                if not hasattr(victim, "shield_timer") or victim.shield_timer <= 0:
-                    victim.hp -= 1
-
-        # ✅ Timed powerup effects
-        if hasattr(self, "homing_bullet_timer") and self.homing_bullet_timer > 0:
-            self.homing_bullet_timer -= 1
-        if hasattr(self, "double_shot_timer") and self.double_shot_timer > 0:
-            self.double_shot_timer -= 1
-        if hasattr(self, "shield_timer") and self.shield_timer > 0:
-            self.shield_timer -= 1
-
-    def draw(self, surf: Surface):
-        # Rotate the tank image based on angle
-        rotated_image = pygame.transform.rotate(self.original_image, self.angle)
-        rotated_rect = rotated_image.get_rect(center=self.rect.center)
-        surf.blit(rotated_image, rotated_rect)
-
-        # Draw shield circle if shield is active
-        if hasattr(self, "shield_timer") and self.shield_timer > 0:
-            pygame.draw.circle(
-                surf,
-                (135, 206, 250),  # Light blue color
-                self.rect.center,
-                max(self.rect.width, self.rect.height) // 2 + 15,
-                4  # Thickness of the ring
+
+    def _build_rotation_cache(self) -> dict:
+        key = (self.sprite, Settings.TANK_WIDTH, Settings.TANK_HEIGHT)
+        if key not in Tank.rotation_cache:
+            # Drop rotations of this sprite at a previous tank size
+            for old_key in [k for k in Tank.rotation_cache if k[0] == self.sprite]:
+                del Tank.rotation_cache[old_key]
+            Tank.rotation_cache[key] = {
+                angle: pygame.transform.rotate(self.original_image, angle)
+                for angle in map(self._rotation_key, Tank.PRESET_ANGLES)
+            }
+        return Tank.rotation_cache[key]
+
+    @staticmethod
+    def _rotation_key(angle: float) -> float:
+        if Settings.ROTATION_BUCKETS > 0:
+            step = 360 / Settings.ROTATION_BUCKETS
+            return (round(angle / step) % Settings.ROTATION_BUCKETS) * step
+        # atan2 leaves float noise on the eight headings, e.g. 135.00000000000003
+        return round(angle, 3) % 360
+
+    def rotated_image(self) -> Surface:
+        if self.original_image.get_size() != (Settings.TANK_WIDTH, Settings.TANK_HEIGHT):
+            self.original_image = pygame.transform.scale(
+                Tank.tank_images[self.sprite], (Settings.TANK_WIDTH, Settings.TANK_HEIGHT)
             )
+            self.rotated_images = self._build_rotation_cache()
+        key = self._rotation_key(self.angle)
+        image = self.rotated_images.get(key)
+        if image is None:
+            image = self.rotated_images[key] = pygame.transform.rotate(self.original_image, key)
+        return image
+
+    def bounds(self) -> Rect:
+        # Everything draw() can touch: the rotated sprite, the shield ring and the health blocks
+        reach = max(self.rect.width, self.rect.height) // 2 + 17
+        around = Rect(0, 0, 2 * reach, 2 * reach)
+        around.center = self.rect.center
+        return around.union((self.rect.left, self.rect.top - 25, max(self.hp, 0) * 22, 20))
+
+    def draw(self, surf: Surface, offset=(0, 0)) -> Rect:
+        # offset: added to world coordinates to get screen coordinates (Camera.offset)
+        rect = self.rect.move(offset)
+        # Rotate the tank image based on angle
+        rotated_image = self.rotated_image()
+        rotated_rect = rotated_image.get_rect(center=rect.center)
+        drawn = [surf.blit(rotated_image, rotated_rect)]
+
+        # Active effects draw over the tank, like the shield's bubble
+        for effect in self.effects.values():
+            shape = effect.draw(self, surf, rect)
+            if shape:
+                drawn.append(shape)
 
         # Draw health blocks
         for i in range(self.hp):
-            x = self.rect.left + i * 22
-            y = self.rect.top - 25
-            pygame.draw.rect(surf, Settings.HEALTH_COLOR, (x, y, 20, 20))
+            x = rect.left + i * 22
+            y = rect.top - 25
+            drawn.append(pygame.draw.rect(surf, Settings.HEALTH_COLOR, (x, y, 20, 20)))
+
+        # Bounding rect of everything drawn, for dirty-rect rendering
+        return drawn[0].unionall(drawn[1:])
 
 
 class Game:
     _inst = None
 
+    # save_state() layout: STATE_HEADER, RNG state, then one record per tank (followed by
+    # its effect count of STATE_EFFECT records), bullet and powerup
+    STATE_HEADER = struct.Struct("<IIId???bBIH")
+    STATE_RNG = struct.Struct("<B?d")
+    STATE_TANK = struct.Struct("<iiiidiiiiB")
+    STATE_EFFECT = struct.Struct("<Bi")  # effect id (see effects.EFFECTS), ticks left
+    STATE_BULLET = struct.Struct("<Biiiiddb")
+    STATE_POWERUP = struct.Struct("<Bii?i")
+    STATE_VERSION = 2  # bumped whenever the layout changes; replays ignore keyframes of another version
+
     @classmethod
     def instance(cls):
         return cls._inst
 
-    def save_score_to_csv(self):
-        filename = "player_scores.csv"
-        file_exists = os.path.isfile(filename)
-
-        scores = {}
-        if file_exists:
-            with open(filename, mode="r", newline="") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    scores[row["Player"]] = {
-                        "Rank Points": int(row["Rank Points"]),
-                        "Net Score": int(row["Net Score"])
-                    }
-
-        player1_name, player2_name = self.player_names
-        player1_score = self.tanks[0].score
-        player2_score = self.tanks[1].score
-
-        for name in [player1_name, player2_name]:
-            if name not in scores:
-                scores[name] = {"Rank Points": 0, "Net Score": 0}
-
-        if self.is_draw:
-            scores[player1_name]["Rank Points"] += 5
-            scores[player2_name]["Rank Points"] += 5
-        else:
-            if self.winner == self.tanks[0]:
-                winner_name = player1_name
-                remaining_hp = self.tanks[0].hp
-            else:
-                winner_name = player2_name
-                remaining_hp = self.tanks[1].hp
-
-            scores[winner_name]["Rank Points"] += 10
-            scores[winner_name]["Net Score"] += remaining_hp
-
-        with open(filename, mode="w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=["Player", "Rank Points", "Net Score"])
-            writer.writeheader()
-            for name, data in scores.items():
-                writer.writerow({"Player": name, "Rank Points": data["Rank Points"], "Net Score": data["Net Score"]})
-
-    def __init__(self):
+    def match_results(self):
+        """The finished match for the ladder: one (player1, player2, winner or None,
+        remaining hp) result between the two players, won by whoever placed higher
+        (stayed in play longer). Going out on the same tick is a draw. Bots stay off
+        the ladder, and teammates didn't play each other, so they get none."""
+        a, b = self.tanks[:2]
+        if a.team == b.team:
+            return []
+        place_a, place_b = (math.inf if t.out_frame is None else t.out_frame for t in (a, b))
+        if place_a == place_b:
+            return [(a.name, b.name, None, 0)]
+        winner = a if place_a > place_b else b
+        return [(a.name, b.name, winner.name, max(winner.hp, 0))]
+
+    def save_score(self):
+        # Written on the score-writer thread; the victory frame doesn't wait for the disk
+        results = self.match_results()
+        if not results:
+            return
+        if self.score_writer is None:
+            self.score_writer = ScoreWriter(Settings.SCOREBOARD_PATH)
+        self.score_writer.submit(results)
+
+    def __init__(self, headless: bool = False):
         Game._inst = self
+        self.headless = headless
         pygame.init()
-        self.screen = pygame.display.set_mode((Settings.WIDTH, Settings.HEIGHT))
-        pygame.display.set_caption("Super Tank")
+        if headless:
+            # No window: update() runs normally, draw() is never called
+            self.screen = None
+        else:
+            self.screen = pygame.display.set_mode((Settings.WIDTH, Settings.HEIGHT))
+            pygame.display.set_caption("Super Tank")
         self.clock = pygame.time.Clock()
         self.running = True
         self.in_menu = True
@@ -331,13 +495,12 @@ class Game:
         self.cheat_wall = False
         self.bullet_hack = False
         self.bullet_through_wall = False
-        self.safe_zone_center = Vector2(Settings.WIDTH // 2, Settings.HEIGHT // 2)
-        self.safe_zone_radius = math.hypot(Settings.WIDTH, Settings.HEIGHT) / 2
         self.shrink_timer = 0
-        self.shrink_interval = 30 * Settings.FPS
+        self.shrink_interval = 30 * Settings.TICK_RATE
         self.shrinking = False
         self.safe_zone_visible = False
         self.player_names = ["Player1", "Player2"]
+        self.ai_players = [False, False]  # per tank: driven by an AIController instead of the keyboard
         self.is_restarting = False
         self.winner = None
         # --- Added for player input UI ---
@@ -352,16 +515,45 @@ class Game:
         self.is_draw = False
         self.powerups = []
         self.powerup_spawn_timer = 0
-        self.powerup_spawn_interval = 5 * Settings.FPS  # Spawn every 5 seconds
+        self.powerup_spawn_interval = 5 * Settings.TICK_RATE  # Spawn every 5 seconds
+        self.recorder = None
+        self.replaying = False
+        # Headless games (tournament workers, training envs) never touch the score database
+        self.scoreboard = None if headless else Scoreboard(Settings.SCOREBOARD_PATH)
+        self.score_writer = None  # started by the first save_score()
+        self.arena_layer = None  # allocated by the first build_arena_layer(), then redrawn in place
         self.restart()
 
     def quit_game(self):
+        self.stop_recording()
+        if self.score_writer:
+            self.score_writer.close()
+        if self.scoreboard:
+            self.scoreboard.close()
         pygame.quit()
         sys.exit()
 
+    def run_menu(self, draw, on_event):
+        """Shared loop for the menu screens.
+
+        Blocks on pygame.event.wait() instead of spinning, and only redraws
+        (draw()) and flips after input arrives. on_event(e) returns a truthy
+        value to close the menu, which run_menu then returns."""
+        redraw = True
+        while True:
+            if redraw:
+                draw()
+                pygame.display.flip()
+            e = pygame.event.wait()
+            if e.type == pygame.QUIT:
+                self.quit_game()
+            result = on_event(e)
+            if result:
+                return result
+            # Hovering changes nothing on screen; drags (sliders) and everything else do
+            redraw = not (e.type == pygame.MOUSEMOTION and not any(e.buttons))
+
     def select_difficulty(self):
-        font = load_font(36)
-        small_font = load_font(24)
         button_width, button_height = 200, 60
         gap = 80
         total_height = 3 * button_height + 2 * gap
@@ -374,115 +566,291 @@ class Game:
             ("Hard", pygame.Rect(center_x, start_y + 2 * (button_height + gap), button_width, button_height)),
         ]
 
-        while True:
+        def draw():
             self.screen.fill((180, 180, 180))
             for text, rect in buttons:
                 pygame.draw.rect(self.screen, (100, 100, 100), rect)
-                label = font.render(text, True, (255, 255, 255))
+                label = render_text(36, text, (255, 255, 255))
                 label_rect = label.get_rect(center=rect.center)
                 self.screen.blit(label, label_rect)
 
-            hint_text = small_font.render("Press ESC to return to menu", True, (50, 50, 50))
+            hint_text = render_text(24, "Press ESC to return to menu", (50, 50, 50))
             hint_rect = hint_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 50))
             self.screen.blit(hint_text, hint_rect)
 
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    self.quit_game()
-                if e.type == pygame.MOUSEBUTTONDOWN:
-                    for idx, (_, rect) in enumerate(buttons):
-                        if rect.collidepoint(e.pos):
-                            self.difficulty = idx
-                            return
-                if e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_ESCAPE:
-                        return
+        def on_event(e):
+            if e.type == pygame.MOUSEBUTTONDOWN:
+                for idx, (_, rect) in enumerate(buttons):
+                    if rect.collidepoint(e.pos):
+                        self.difficulty = idx
+                        return True
+            if e.type == pygame.KEYDOWN:
+                if e.key == pygame.K_ESCAPE:
+                    return True
 
-            pygame.display.flip()
+        self.run_menu(draw, on_event)
 
-    def restart(self):
-        self.safe_zone_radius = math.hypot(Settings.WIDTH, Settings.HEIGHT) / 2
+    def restart(self, seed: Optional[int] = None):
+        self.stop_recording()
+        # Every match gets its own RNG so a seed plus the inputs reproduce it exactly
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.frame = 0
+        self.accumulator = 0.0
+        self.is_draw = False
+        self.is_restarting = False
+        self.powerups = []
+        self.powerup_spawn_timer = 0
+        self.effects = EffectScheduler()  # timed powerup effects of every tank, by the tick they end on
+        self.game_map = GameMap.load(self.map_path())
+        self.world_rect = Rect(0, 0, Settings.WORLD_WIDTH or self.game_map.width,
+                               Settings.WORLD_HEIGHT or self.game_map.height)
+        layout = self.game_map.tiled(*self.world_rect.size)
+        self.safe_zone_center = Vector2(layout.safe_zone_center)
+        self.safe_zone_radius = math.hypot(*self.world_rect.size) / 2
+        self.powerup_regions = layout.powerup_regions
         self.shrink_timer = 0
         self.shrinking = False
         self.safe_zone_visible = False
         self.winner = None
 
-        if self.difficulty == 0:
-            self.obstacles = [Obstacle(460, 235, 60, 280)]
-        elif self.difficulty == 1:
-            self.obstacles = [
-                Obstacle(310, 160, 60, 430),
-                Obstacle(825, 150, 75, 450),
-                Obstacle(562, 0, 75, 225),
-                Obstacle(562, 675, 75, 225),
-            ]
-        else:
-            self.obstacles = [
-                Obstacle(225, 120, 75, 300),
-                Obstacle(300, 525, 75, 300),
-                Obstacle(900, 120, 75, 300),
-                Obstacle(750, 525, 75, 300),
-                Obstacle(450, 225, 300, 30),
-                Obstacle(460, 650, 280, 20),
-                Obstacle(562, 30, 75, 150),
-                Obstacle(562, 720, 75, 150),
-                Obstacle(75, 412, 225, 75),
-                Obstacle(900, 412, 225, 75),
-                Obstacle(562, 412, 75, 75)
-            ]
-
-        if self.difficulty != 2:
-            self.tanks = [
-                Tank(Vector2(100, Settings.HEIGHT // 2), (0, 0, 255),
-                     dict(up=pygame.K_w, down=pygame.K_s, left=pygame.K_a, right=pygame.K_d, shoot=pygame.K_SPACE),
-                     self.player_names[0], player_index=0),
-                Tank(Vector2(Settings.WIDTH - 100, Settings.HEIGHT // 2), (0, 255, 0),
-                     dict(up=pygame.K_UP, down=pygame.K_DOWN, left=pygame.K_LEFT, right=pygame.K_RIGHT,
-                          shoot=pygame.K_RETURN),
-                     self.player_names[1], player_index=1),
-            ]
-        else:
-            blue_spawn = Vector2(75, 100)
-            green_spawn = Vector2(Settings.WIDTH - 75, Settings.HEIGHT - 100)
-            self.tanks = [
-                Tank(blue_spawn, (0, 0, 255),
-                     dict(up=pygame.K_w, down=pygame.K_s, left=pygame.K_a, right=pygame.K_d, shoot=pygame.K_SPACE),
-                     self.player_names[0], player_index=0),
-                Tank(green_spawn, (0, 255, 0),
-                     dict(up=pygame.K_UP, down=pygame.K_DOWN, left=pygame.K_LEFT, right=pygame.K_RIGHT,
-                          shoot=pygame.K_RETURN),
-                     self.player_names[1], player_index=1),
-            ]
-
-    @property
-    def colliders(self):
-        return self.obstacles + self.tanks
+        keymaps = [
+            dict(up=pygame.K_w, down=pygame.K_s, left=pygame.K_a, right=pygame.K_d, shoot=pygame.K_SPACE),
+            dict(up=pygame.K_UP, down=pygame.K_DOWN, left=pygame.K_LEFT, right=pygame.K_RIGHT, shoot=pygame.K_RETURN),
+        ]
+        self.tanks = [Tank(Vector2(layout.spawns[i]), self.tank_color(i, self.team_of(i)), keymaps[i],
+                           self.player_names[i], player_index=i, team=self.team_of(i)) for i in range(2)]
+        self.tank_hash = SpatialHash(Settings.SPATIAL_CELL_SIZE)
+        for t in self.tanks:
+            self.tank_hash.insert(t)
+
+        # Obstacle broadphase, nav grid and spawn cells only depend on the map file, world and tank size,
+        # so they are compiled once into a sidecar file; later restarts map it instead of rebuilding them
+        self.compiled_map = CompiledMap.for_map(self.game_map, *self.world_rect.size, self.tanks[0].rect.size,
+                                                Settings.NAV_CELL_SIZE, Settings.SPATIAL_CELL_SIZE,
+                                                Settings.MAP_CACHE_DIR)
+        self.obstacles = [Obstacle(*r) for r in self.compiled_map.obstacle_rects()]
+        self.obstacle_hash = self.compiled_map.spatial_index(self.obstacles)
+        self.nav_grid = self.compiled_map.nav_grid
+        # Where powerups can spawn; each one keeps the others off its spot while it lies there
+        self.powerup_space = FreeSpace(self.compiled_map.powerup_cells, self.nav_grid.cols, self.nav_grid.cell_size,
+                                       (POWERUP_SIZE, POWERUP_SIZE))
+        self.visibility = Visibility.for_layout([ob.rect for ob in self.obstacles], *self.world_rect.size,
+                                                Settings.VISIBILITY_CELL_SIZE, Settings.VISIBILITY_CACHE_DIR,
+                                                Settings.VISIBILITY_MAX_CELLS, self.obstacle_hash)
+
+        # Bots take the map's extra spawn points, then spread out ones; fewer than asked if the arena fills up
+        count = max(2, min(Settings.TANK_COUNT, Settings.MAX_TANKS))
+        centers = chain(layout.spawns[2:], self._spread_spawns(count - 2))
+        for i, center in zip(range(2, count), centers):
+            team = self.team_of(i)
+            t = Tank(Vector2(center), self.tank_color(i, team), None, f"Bot {i + 1}", player_index=i, team=team)
+            self.tanks.append(t)
+            self.tank_hash.insert(t)
+        for i, t in enumerate(self.tanks):
+            if i >= len(self.ai_players) or self.ai_players[i]:
+                t.controller = AIController(Settings.TANK_SPEED)
+        # team -> how many of its tanks are still in, for spotting the last team standing in O(1)
+        self.team_tanks = Counter(t.team for t in self.tanks)
+        self.hittable = {}
+        self.powerup_hash = SpatialHash(Settings.SPATIAL_CELL_SIZE)
+        for powerup in self.powerups:
+            self.powerup_hash.insert(powerup)
 
-    def check_bullet_obstacle(self, bullet: Bullet) -> bool:
-        return any(bullet.intersects(ob.rect) for ob in self.obstacles)
+        if Settings.NUMPY_BULLETS and BulletEngine.available:
+            self.bullet_engine = BulletEngine(Settings.BULLET_SIZE, Settings.BULLET_SPEED,
+                                              *self.world_rect.size, swept=Settings.SWEPT_COLLISION)
+            self.bullet_engine.set_obstacles(ob.rect for ob in self.obstacles)
+        else:
+            self.bullet_engine = None
 
-    def check_bullet_tank(self, bullet: Bullet, owner: Tank) -> bool:
+        if Settings.CAMERA_MODE == "split":
+            half = Settings.WIDTH // 2
+            viewports = [Rect(0, 0, half - 2, Settings.HEIGHT), Rect(half + 2, 0, Settings.WIDTH - half - 2,
+                                                                     Settings.HEIGHT)]
+        else:
+            viewports = [Rect(0, 0, Settings.WIDTH, Settings.HEIGHT)]
+        self.cameras = [Camera(viewport, self.world_rect) for viewport in viewports]
+        self.update_cameras()
+        # A new layout always gets a fresh arena layer, and menus drew over the whole screen
+        self.arena_key = None
+        self.build_arena_layer()
+        self.full_redraw = True
+        self.dirty_rects = []
+
+    def map_path(self) -> str:
+        # Settings.MAP_FILE if set, else the built-in map for the difficulty
+        if Settings.MAP_FILE:
+            return Settings.MAP_FILE
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), Settings.MAP_DIR,
+                            Settings.MAPS[min(self.difficulty, len(Settings.MAPS) - 1)])
+
+    def update_cameras(self):
+        # Shared: one camera on the box around both players; split: each player's own camera.
+        # A camera whose tanks are all out stays where it was.
+        players = self.tanks[:2]
+        if len(self.cameras) == 1:
+            followed = [[t for t in players if not t.destroyed]]
+        else:
+            followed = [[t] if not t.destroyed else [] for t in players]
+        for camera, tanks in zip(self.cameras, followed):
+            camera.follow([t.rect.center for t in tanks])
+
+    def _arena_key(self):
+        return (Settings.BG_COLOR, Settings.OBSTACLE_COLOR, tuple(tuple(camera.viewport) for camera in self.cameras))
+
+    def paint_arena(self, camera: Camera, area: Rect):
+        # Background and the obstacles in world rect area, drawn into the arena layer where camera shows them
+        self.arena_layer.set_clip(area.move(camera.offset).clip(camera.viewport))
+        self.arena_layer.fill(Settings.BG_COLOR)
+        for ob in self.obstacle_hash.query(area):
+            ob.draw(self.arena_layer, camera.offset)
+        self.arena_layer.set_clip(None)
+
+    def build_arena_layer(self) -> List[Rect]:
+        """Background and obstacles never move, so what the cameras show of them is kept in
+        one screen-sized layer. A camera that moved scrolls its part of the layer and only
+        the strips it uncovered are drawn. Returns the screen rects that changed."""
+        if self.headless:
+            return []
+        size = (Settings.WIDTH, Settings.HEIGHT)
+        key = self._arena_key()
+        if self.arena_layer is None or self.arena_layer.get_size() != size:
+            self.arena_layer = pygame.Surface(size).convert()
+            self.arena_key = None
+        if self.arena_key != key:
+            self.arena_layer.fill(Settings.SPLIT_COLOR)
+            for camera in self.cameras:
+                self.paint_arena(camera, camera.view)
+            self.arena_key = key
+            self.arena_views = [Rect(camera.view) for camera in self.cameras]
+            return [self.arena_layer.get_rect()]
+
+        changed = []
+        for camera, drawn in zip(self.cameras, self.arena_views):
+            view = camera.view
+            if view == drawn:
+                continue
+            dx, dy = drawn.x - view.x, drawn.y - view.y
+            if abs(dx) < view.width and abs(dy) < view.height:
+                # Scrolling stays inside the clip, so the other split-screen view is left alone
+                self.arena_layer.set_clip(camera.viewport)
+                self.arena_layer.scroll(dx, dy)
+                self.arena_layer.set_clip(None)
+                # What the last view didn't show: a band of columns and a band of rows
+                if dx:
+                    self.paint_arena(camera, Rect(view.x if dx > 0 else drawn.right, view.y, abs(dx), view.height))
+                if dy:
+                    self.paint_arena(camera, Rect(view.x, view.y if dy > 0 else drawn.bottom, view.width, abs(dy)))
+            else:
+                self.paint_arena(camera, view)
+            drawn.topleft = view.topleft
+            changed.append(camera.viewport)
+        return changed
+
+    def sweep_bullet_obstacle(self, bullet: Bullet) -> Optional[float]:
+        # Earliest time (0..1 of this frame's move) the bullet hits an obstacle, or None
+        times = [t for t in (bullet.sweep(ob.rect) for ob in self.obstacle_hash.candidates(bullet.swept_rect()))
+                 if t is not None]
+        return min(times, default=None)
+
+    def sweep_bullet_tank(self, bullet: Bullet, owner: Tank) -> Optional[Tuple[float, Tank]]:
+        # (time, tank) of the first enemy still in the match the bullet hits this frame, or None
+        hits = [(t, tank) for tank in self.tank_hash.candidates(bullet.swept_rect()) if tank.team != owner.team
+                for t in (bullet.sweep(tank.rect),) if t is not None]
+        return min(hits, key=lambda hit: hit[0], default=None)
+
+    def can_see(self, a: Tank, b: Tank) -> bool:
+        # Line of sight between two tank centers, ignoring the tanks themselves
+        return self.visibility.visible(a.rect.center, b.rect.center)
+
+    def nearest_enemy(self, tank: Tank) -> Optional[Tank]:
+        # Closest tank of another team still in the match, from a ring search of the tank broadphase
+        return self.tank_hash.nearest(tank.rect.center, math.hypot(*self.world_rect.size),
+                                      lambda other: other.team != tank.team)
+
+    def hittable_by(self, tank: Tank) -> List[bool]:
+        # Per tank, whether tank's bullets can hit it: enemies that are still in the match.
+        # Only changes when a tank is knocked out, so it is kept per team until then.
+        hittable = self.hittable.get(tank.team)
+        if hittable is None:
+            hittable = self.hittable[tank.team] = [other.team != tank.team and not other.destroyed
+                                                   for other in self.tanks]
+        return hittable
+
+    @staticmethod
+    def team_of(index: int) -> int:
+        return index % Settings.TEAM_COUNT if Settings.TEAM_COUNT >= 2 else index
+
+    @staticmethod
+    def tank_color(index: int, team: int) -> Tuple[int, int, int]:
+        if index < 2 and Settings.TEAM_COUNT < 2:
+            return Settings.PLAYER_COLORS[index]
+        if Settings.TEAM_COUNT >= 2:
+            return Settings.TEAM_COLORS[team % len(Settings.TEAM_COLORS)]
+        # Golden-angle hues keep any number of free-for-all bots apart
+        color = pygame.Color(0)
+        color.hsva = ((index * 137.5) % 360, 80, 90, 100)
+        return color.r, color.g, color.b
+
+    def _spread_spawns(self, count: int, candidates: int = 4096):
+        """Yields up to count tank centers, each on the free cell farthest from every
+        tank placed so far (farthest-point sampling) where a tank fits without
+        overlapping one. The caller places a tank before asking for more.
+        Big maps only consider an evenly strided sample of about candidates cells."""
+        grid = self.nav_grid
+        space = FreeSpace(self.compiled_map.spawn_cells, grid.cols, grid.cell_size, self.tanks[0].rect.size)
         for t in self.tanks:
-            if t is not owner and bullet.intersects(t.rect):
-                return True
-        return False
-
-    def get_other_tank(self, tank: Tank) -> Tank:
-        return self.tanks[0] if tank is self.tanks[1] else self.tanks[1]
+            space.block(t, t.rect)
+        picks = space.cells[::max(1, len(space) // candidates)]
+        cells = [space.center(i) for i in picks]
+        gap = [min((x - tx) ** 2 + (y - ty) ** 2 for tx, ty in (t.rect.center for t in self.tanks))
+               for x, y in cells]
+        body = self.tanks[0].rect.copy()
+        for _ in range(count):
+            while cells:
+                best = max(range(len(cells)), key=gap.__getitem__)
+                if gap[best] < 0:
+                    return  # no free cell left
+                if space.is_free(picks[best]):
+                    break
+                gap[best] = -1
+            else:
+                return
+            x, y = cells[best]
+            body.center = x, y
+            space.block((x, y), body)
+            yield x, y
+            gap = [min(g, (cx - x) ** 2 + (cy - y) ** 2) if g >= 0 else g for g, (cx, cy) in zip(gap, cells)]
+
+    def knock_out(self, tank: Tank):
+        # Take a destroyed tank out of play; bullets it already fired keep flying
+        tank.out_frame = self.frame
+        self.tank_hash.remove(tank)
+        self.hittable.clear()
+        self.team_tanks[tank.team] -= 1
+        if not self.team_tanks[tank.team]:
+            del self.team_tanks[tank.team]
+
+    def check_last_standing(self) -> bool:
+        # Ends the match once at most one team is left: it wins, or with nobody left it's a draw
+        if len(self.team_tanks) == 1:
+            (team,) = self.team_tanks
+            self.winner = next(t for t in self.tanks if t.team == team and not t.destroyed)
+        elif not self.team_tanks:
+            self.is_draw = True
+        return bool(self.winner or self.is_draw)
 
     def show_menu(self):
-        font = load_font(48)
-        small_font = load_font(36)
-        version_font = load_font(24)
         start_button = pygame.Rect(Settings.WIDTH // 2 - 100, 200, 200, 60)
         setting_button = pygame.Rect(Settings.WIDTH // 2 - 100, 280, 200, 60)
         difficulty_button = pygame.Rect(Settings.WIDTH // 2 - 100, 360, 200, 60)
         instruction_button = pygame.Rect(Settings.WIDTH // 2 - 100, 440, 200, 60)
         ranking_button = pygame.Rect(Settings.WIDTH // 2 - 100, 520, 200, 60)
 
-        while True:
+        def draw():
             self.screen.fill((240, 240, 240))
-            title = font.render("Tank Game", True, (0, 0, 0))
+            title = render_text(48, "Tank Game", (0, 0, 0))
             self.screen.blit(title, title.get_rect(center=(Settings.WIDTH // 2, 100)))
 
             pygame.draw.rect(self.screen, (0, 200, 0), start_button)
@@ -491,90 +859,178 @@ class Game:
             pygame.draw.rect(self.screen, (100, 100, 100), instruction_button)
             pygame.draw.rect(self.screen, (255, 140, 0), ranking_button)
 
-            self.screen.blit(small_font.render("START", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "START", (255, 255, 255)),
                              (start_button.x + 50, start_button.y + 10))
-            self.screen.blit(small_font.render("SETTING", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "SETTING", (255, 255, 255)),
                              (setting_button.x + 30, setting_button.y + 10))
-            self.screen.blit(small_font.render("DIFFICULTY", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "DIFFICULTY", (255, 255, 255)),
                              (difficulty_button.x + 20, difficulty_button.y + 10))
-            self.screen.blit(small_font.render("INSTRUCTION", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "INSTRUCTION", (255, 255, 255)),
                              (instruction_button.x + 15, instruction_button.y + 10))
-            self.screen.blit(small_font.render("RANKING", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "RANKING", (255, 255, 255)),
                              (ranking_button.x + 30, ranking_button.y + 10))
 
-            version_text = version_font.render("Beta Version 5.6", True, (150, 150, 150))
+            version_text = render_text(24, "Beta Version 5.6", (150, 150, 150))
             version_rect = version_text.get_rect(bottomright=(Settings.WIDTH - 10, Settings.HEIGHT - 10))
             self.screen.blit(version_text, version_rect)
 
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    self.quit_game()
-                if e.type == pygame.MOUSEBUTTONDOWN:
-                    if start_button.collidepoint(e.pos):
-                        self.show_account_input()
-                        return
-                    if setting_button.collidepoint(e.pos):
-                        self.show_settings()
-                    if difficulty_button.collidepoint(e.pos):
-                        self.select_difficulty()
-                    if instruction_button.collidepoint(e.pos):
-                        self.show_instruction()
-                    if ranking_button.collidepoint(e.pos):
-                        self.show_ranking()
-
-            pygame.display.flip()
+        def on_event(e):
+            if e.type == pygame.MOUSEBUTTONDOWN:
+                if start_button.collidepoint(e.pos):
+                    self.show_account_input()
+                    return True
+                if setting_button.collidepoint(e.pos):
+                    self.show_settings()
+                if difficulty_button.collidepoint(e.pos):
+                    self.select_difficulty()
+                if instruction_button.collidepoint(e.pos):
+                    self.show_instruction()
+                if ranking_button.collidepoint(e.pos):
+                    self.show_ranking()
+
+        self.run_menu(draw, on_event)
 
     def show_ranking(self):
-        font = load_font(36)
-        title_font = load_font(48)
-        hint_font = load_font(24)
         bg_color = (200, 200, 200)
         text_color = (0, 0, 0)
-
-        try:
-            with open("player_scores.csv", newline='') as csvfile:
-                reader = csv.reader(csvfile)
-                next(reader, None)
-                ranking_list = [row for row in reader if len(row) >= 2 and row[1].isdigit()]
-                ranking_list = sorted(ranking_list, key=lambda row: int(row[1]), reverse=True)
-        except FileNotFoundError:
-            ranking_list = []
-
-        while True:
+        row_height = 40
+        top_y = 190
+        page_size = (Settings.HEIGHT - top_y - 140) // row_height
+
+        # Include results still queued for the writer
+        if self.score_writer:
+            self.score_writer.flush()
+        order = list(RANKINGS)
+        by = "points"  # what the full list is ordered by, Tab cycles through RANKINGS
+        total = self.scoreboard.count(by)
+        matches = 0
+        query = ""
+        offset = 0  # list index of the first row on screen
+        selected = 0  # list index of the highlighted row
+        rows = []
+        row_surfaces = []
+
+        search_rect = pygame.Rect(Settings.WIDTH // 2 - 250, 115, 500, 44)
+        back_text = render_text(28, "Back to Menu", (0, 0, 0))
+        back_rect = back_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 80))
+
+        def load_page():
+            # Only the visible page is queried and rendered; draw() just blits these
+            nonlocal rows, row_surfaces
+            if query:
+                rows = self.scoreboard.search(query, page_size, offset)
+                texts = [f"{name} - {points} pts" for name, points, _ in rows]
+            else:
+                rows = self.scoreboard.top(page_size, offset, by)
+                if by == "points":
+                    texts = [f"{offset + i + 1}. {name} - {points} pts" for i, (name, points, _) in enumerate(rows)]
+                elif by == "elo":
+                    texts = [f"{offset + i + 1}. {name} - {rating:.0f} ({games} games)"
+                             for i, (name, rating, games) in enumerate(rows)]
+                else:
+                    texts = [f"{offset + i + 1}. {name} - {rating:.0f} \u00b1 {2 * rd:.0f}"
+                             for i, (name, rating, rd) in enumerate(rows)]
+            row_surfaces = [render_text(32, text, text_color) for text in texts]
+
+        def select(index, first_row=None):
+            # Highlight row index, scrolling (or jumping to first_row) so it stays on screen
+            nonlocal selected, offset
+            count = matches if query else total
+            selected = max(0, min(index, count - 1))
+            if first_row is not None:
+                offset = first_row
+            offset = max(0, min(offset, count - page_size, selected))
+            if selected >= offset + page_size:
+                offset = selected - page_size + 1
+            load_page()
+
+        def draw():
             self.screen.fill(bg_color)
-            title = title_font.render("Ranking", True, (50, 50, 50))
+            title = render_text(48, f"Ranking - {RANKINGS[by][3]}", (50, 50, 50))
             self.screen.blit(title, title.get_rect(center=(Settings.WIDTH // 2, 80)))
 
-            for idx, row in enumerate(ranking_list):
-                name, score = row[0], row[1]
-                text = f"{idx + 1}. {name} - {score} pts"
-                rendered = font.render(text, True, text_color)
-                self.screen.blit(rendered, (Settings.WIDTH // 2 - 200, 150 + idx * 50))
+            pygame.draw.rect(self.screen, (255, 255, 255), search_rect)
+            pygame.draw.rect(self.screen, (0, 0, 0), search_rect, 2)
+            if query:
+                search_text = render_text(32, query, text_color)
+            else:
+                search_text = render_text(28, "Type a name to search", (130, 130, 130))
+            self.screen.blit(search_text, search_text.get_rect(midleft=(search_rect.x + 10, search_rect.centery)))
+
+            for idx, rendered in enumerate(row_surfaces):
+                y = top_y + idx * row_height
+                if offset + idx == selected:
+                    pygame.draw.rect(self.screen, (170, 170, 220),
+                                     (Settings.WIDTH // 2 - 220, y - 4, 440, row_height))
+                self.screen.blit(rendered, (Settings.WIDTH // 2 - 200, y))
+
+            count = matches if query else total
+            if query:
+                status = f"{count} players match"
+            else:
+                status = f"Page {selected // page_size + 1} of {max(1, -(-count // page_size))}"
+            status_text = render_text(24, status, (50, 50, 50))
+            self.screen.blit(status_text, status_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 125)))
 
-            hint_text = hint_font.render("Press ESC to return to menu", True, (0, 0, 0))
+            hint_text = render_text(24, "Up/Down: scroll   PgUp/PgDn: page   Tab: rating   Enter: jump to player   "
+                                        "ESC: return to menu", (0, 0, 0))
             hint_rect = hint_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 40))
             self.screen.blit(hint_text, hint_rect)
 
-            back_font = load_font(28)
-            back_text = back_font.render("Back to Menu", True, (0, 0, 0))
-            back_rect = back_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 80))
             pygame.draw.rect(self.screen, (180, 180, 180), back_rect.inflate(20, 10))
             self.screen.blit(back_text, back_rect)
 
-            pygame.display.flip()
-
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    self.quit_game()
-                if e.type == pygame.MOUSEBUTTONDOWN:
-                    if back_rect.collidepoint(e.pos):
-                        return
-                if e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_ESCAPE:
-                        return
+        def on_event(e):
+            nonlocal query, matches, by, total
+            if e.type == pygame.MOUSEBUTTONDOWN:
+                if back_rect.collidepoint(e.pos):
+                    return True
+            if e.type == pygame.MOUSEWHEEL:
+                select(selected - 3 * e.y, offset - 3 * e.y)
+            if e.type == pygame.KEYDOWN:
+                count = matches if query else total
+                if e.key == pygame.K_ESCAPE:
+                    if not query:
+                        return True
+                    query = ""
+                    select(0, 0)
+                elif e.key == pygame.K_TAB:
+                    # Keep the highlighted player in view under the new ordering
+                    name = rows[selected - offset][0] if rows else None
+                    by = order[(order.index(by) + 1) % len(order)]
+                    total = self.scoreboard.count(by)
+                    position = self.scoreboard.rank(name, by) if name and not query else None
+                    if position is None:
+                        select(selected)
+                    else:
+                        select(position, position - page_size // 2)
+                elif e.key == pygame.K_UP:
+                    select(selected - 1)
+                elif e.key == pygame.K_DOWN:
+                    select(selected + 1)
+                elif e.key == pygame.K_PAGEUP:
+                    select(selected - page_size, offset - page_size)
+                elif e.key == pygame.K_PAGEDOWN:
+                    select(selected + page_size, offset + page_size)
+                elif e.key == pygame.K_HOME:
+                    select(0, 0)
+                elif e.key == pygame.K_END:
+                    select(count - 1, count - page_size)
+                elif e.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+                    if query and rows:
+                        # Leave the search and show the player at their place in the full ranking
+                        position = self.scoreboard.rank(rows[selected - offset][0], by)
+                        query = ""
+                        select(position, position - page_size // 2)
+                elif e.key == pygame.K_BACKSPACE or (e.unicode.isprintable() and e.unicode and len(query) < 20):
+                    query = query[:-1] if e.key == pygame.K_BACKSPACE else query + e.unicode
+                    matches = self.scoreboard.count_prefix(query)
+                    select(0, 0)
+
+        load_page()
+        self.run_menu(draw, on_event)
 
     def show_instruction(self):
-        font = load_font(28)
         lines = [
             "Instructions:",
             "",
@@ -597,28 +1053,24 @@ class Game:
             "Press ESC to return to menu."
         ]
 
-        while True:
+        def draw():
             self.screen.fill((200, 200, 200))
             total_height = len(lines) * 40
             start_y = (Settings.HEIGHT - total_height) // 2
 
             for i, line in enumerate(lines):
-                text_surf = font.render(line, True, (0, 0, 0))
+                text_surf = render_text(28, line, (0, 0, 0))
                 text_rect = text_surf.get_rect(center=(Settings.WIDTH // 2, start_y + i * 40))
                 self.screen.blit(text_surf, text_rect)
 
-            pygame.display.flip()
+        def on_event(e):
+            if e.type == pygame.KEYDOWN:
+                if e.key == pygame.K_ESCAPE:
+                    return True
 
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_ESCAPE:
-                        return
+        self.run_menu(draw, on_event)
 
     def show_settings(self):
-        font = load_font(32)
         sliders = {
             "Speed": [Settings.TANK_SPEED, 1, 20],
             "Size": [Settings.TANK_WIDTH, 20, 200],
@@ -635,12 +1087,25 @@ class Game:
             slider_rects[key] = pygame.Rect(center_x, start_y + idx * gap, slider_width, 20)
 
         cheat_button = pygame.Rect(Settings.WIDTH // 2 - 100, start_y + len(sliders) * gap + 50, 200, 40)
-
-        while True:
+        ai_button = cheat_button.move(0, 60)
+        # Which tanks the computer drives, cycled by ai_button
+        ai_modes = {"Off": [False, False], "Green": [False, True], "Both": [True, True]}
+        # Tanks per match and teams, cycled by the buttons either side of ai_button
+        tank_counts = (2, 4, 8, 16, 32, 64)
+        team_counts = {0: "Free-for-all", 2: "2 Teams", 4: "4 Teams"}
+        count_button = ai_button.move(-240, 0)
+        team_button = ai_button.move(240, 0)
+        # World size and camera, cycled by the buttons either side of cheat_button
+        world_sizes = {(None, None): "World: Map", (4800, 3600): "World: Large", (20000, 20000): "World: Huge"}
+        camera_modes = {"shared": "Camera: Shared", "split": "Camera: Split"}
+        world_button = cheat_button.move(-240, 0)
+        camera_button = cheat_button.move(240, 0)
+
+        def draw():
             self.screen.fill((220, 220, 220))
 
             for idx, (key, (val, min_val, max_val)) in enumerate(sliders.items()):
-                label = font.render(f"{key}: {int(val)}", True, (0, 0, 0))
+                label = render_text(32, f"{key}: {int(val)}", (0, 0, 0))
                 label_rect = label.get_rect(center=(Settings.WIDTH // 2, start_y + idx * gap - 30))
                 self.screen.blit(label, label_rect)
                 pygame.draw.rect(self.screen, (170, 170, 170), slider_rects[key])
@@ -648,46 +1113,76 @@ class Game:
                 pygame.draw.circle(self.screen, (40, 40, 40), (knob_x, slider_rects[key].centery), 10)
 
             pygame.draw.rect(self.screen, (200, 0, 200), cheat_button)
-            cheat_label = font.render("Cheat", True, (255, 255, 255))
+            cheat_label = render_text(32, "Cheat", (255, 255, 255))
             cheat_label_rect = cheat_label.get_rect(center=cheat_button.center)
             self.screen.blit(cheat_label, cheat_label_rect)
 
-            hint_font = load_font(24)
-            hint_text = hint_font.render("ESC: Menu    ENTER: Confirm", True, (50, 50, 50))
+            pygame.draw.rect(self.screen, (0, 120, 120), ai_button)
+            mode = next((name for name, players in ai_modes.items() if players == self.ai_players), "Off")
+            ai_label = render_text(32, f"AI: {mode}", (255, 255, 255))
+            self.screen.blit(ai_label, ai_label.get_rect(center=ai_button.center))
+
+            world = (Settings.WORLD_WIDTH, Settings.WORLD_HEIGHT)
+            for button, text in ((count_button, f"Tanks: {Settings.TANK_COUNT}"),
+                                 (team_button, team_counts.get(Settings.TEAM_COUNT, f"{Settings.TEAM_COUNT} Teams")),
+                                 (world_button, world_sizes.get(world, "World: {}x{}".format(*world))),
+                                 (camera_button, camera_modes.get(Settings.CAMERA_MODE, Settings.CAMERA_MODE))):
+                pygame.draw.rect(self.screen, (0, 120, 120), button)
+                label = render_text(32, text, (255, 255, 255))
+                self.screen.blit(label, label.get_rect(center=button.center))
+
+            hint_text = render_text(24, "ESC: Menu    ENTER: Confirm", (50, 50, 50))
             hint_rect = hint_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 50))
             self.screen.blit(hint_text, hint_rect)
 
-            pygame.display.flip()
-
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if e.type == pygame.MOUSEBUTTONDOWN:
-                    if cheat_button.collidepoint(e.pos):
-                        self.show_cheat_menu()
-                        continue
-                if e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_ESCAPE:
-                        self.show_menu()
-                        return
-                    if e.key == pygame.K_RETURN:
-                        Settings.TANK_SPEED = sliders["Speed"][0]
-                        Settings.TANK_WIDTH = sliders["Size"][0]
-                        Settings.TANK_HEIGHT = sliders["Size"][0] + 10
-                        Settings.BULLET_COOLDOWN = int(sliders["FireRate"][0])
-                        Settings.TANK_HP = int(sliders["HP"][0])
-                        return
-                if e.type == pygame.MOUSEMOTION and e.buttons[0]:
-                    for key, rect in slider_rects.items():
-                        if rect.collidepoint(e.pos):
-                            min_val, max_val = sliders[key][1], sliders[key][2]
-                            rel_x = e.pos[0] - rect.x
-                            rel_x = max(0, min(rel_x, rect.width))
-                            sliders[key][0] = min_val + (rel_x / rect.width) * (max_val - min_val)
+        def on_event(e):
+            if e.type == pygame.MOUSEBUTTONDOWN:
+                if cheat_button.collidepoint(e.pos):
+                    self.show_cheat_menu()
+                    return
+                if ai_button.collidepoint(e.pos):
+                    modes = list(ai_modes.values())
+                    current = modes.index(self.ai_players) if self.ai_players in modes else -1
+                    self.ai_players = list(modes[(current + 1) % len(modes)])
+                if count_button.collidepoint(e.pos):
+                    bigger = [n for n in tank_counts if n > Settings.TANK_COUNT]
+                    Settings.TANK_COUNT = bigger[0] if bigger else tank_counts[0]
+                if team_button.collidepoint(e.pos):
+                    teams = list(team_counts)
+                    current = teams.index(Settings.TEAM_COUNT) if Settings.TEAM_COUNT in teams else -1
+                    Settings.TEAM_COUNT = teams[(current + 1) % len(teams)]
+                if world_button.collidepoint(e.pos):
+                    worlds = list(world_sizes)
+                    world = (Settings.WORLD_WIDTH, Settings.WORLD_HEIGHT)
+                    current = worlds.index(world) if world in worlds else -1
+                    Settings.WORLD_WIDTH, Settings.WORLD_HEIGHT = worlds[(current + 1) % len(worlds)]
+                if camera_button.collidepoint(e.pos):
+                    modes = list(camera_modes)
+                    current = modes.index(Settings.CAMERA_MODE) if Settings.CAMERA_MODE in modes else -1
+                    Settings.CAMERA_MODE = modes[(current + 1) % len(modes)]
+            if e.type == pygame.KEYDOWN:
+                if e.key == pygame.K_ESCAPE:
+                    self.show_menu()
+                    return True
+                if e.key == pygame.K_RETURN:
+                    Settings.TANK_SPEED = sliders["Speed"][0]
+                    # Whole pixels, so sprite sizes compare equal and the rotation cache is kept
+                    Settings.TANK_WIDTH = int(sliders["Size"][0])
+                    Settings.TANK_HEIGHT = int(sliders["Size"][0]) + 10
+                    Settings.BULLET_COOLDOWN = int(sliders["FireRate"][0])
+                    Settings.TANK_HP = int(sliders["HP"][0])
+                    return True
+            if e.type == pygame.MOUSEMOTION and e.buttons[0]:
+                for key, rect in slider_rects.items():
+                    if rect.collidepoint(e.pos):
+                        min_val, max_val = sliders[key][1], sliders[key][2]
+                        rel_x = e.pos[0] - rect.x
+                        rel_x = max(0, min(rel_x, rect.width))
+                        sliders[key][0] = min_val + (rel_x / rect.width) * (max_val - min_val)
+
+        self.run_menu(draw, on_event)
 
     def show_cheat_menu(self):
-        font = load_font(36)
         button_width, button_height = 200, 60
         start_y = 120
         line_height = 70
@@ -701,7 +1196,7 @@ class Game:
         through_wall_button = pygame.Rect(center_x, start_y + line_height * 5, button_width, button_height)
         quit_button = pygame.Rect(center_x, start_y + line_height * 6, button_width, button_height)
 
-        while True:
+        def draw():
             self.screen.fill((150, 150, 150))
             pygame.draw.rect(self.screen, (0, 0, 255), blue_button)
             pygame.draw.rect(self.screen, (0, 255, 0), green_button)
@@ -711,47 +1206,45 @@ class Game:
             pygame.draw.rect(self.screen, (0, 128, 255), through_wall_button)
             pygame.draw.rect(self.screen, (150, 0, 0), quit_button)
 
-            self.screen.blit(font.render("Blue Cheat", True, (255, 255, 255)), (blue_button.x + 30, blue_button.y + 10))
-            self.screen.blit(font.render("Green Cheat", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "Blue Cheat", (255, 255, 255)), (blue_button.x + 30, blue_button.y + 10))
+            self.screen.blit(render_text(36, "Green Cheat", (255, 255, 255)),
                              (green_button.x + 20, green_button.y + 10))
-            self.screen.blit(font.render("Both Cheat", True, (255, 255, 255)), (both_button.x + 30, both_button.y + 10))
-            self.screen.blit(font.render("Wall Hack", True, (255, 255, 255)), (wall_button.x + 30, wall_button.y + 10))
-            self.screen.blit(font.render("5 Bullet a time", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "Both Cheat", (255, 255, 255)), (both_button.x + 30, both_button.y + 10))
+            self.screen.blit(render_text(36, "Wall Hack", (255, 255, 255)), (wall_button.x + 30, wall_button.y + 10))
+            self.screen.blit(render_text(36, "5 Bullet a time", (255, 255, 255)),
                              (bullet_button.x + 30, bullet_button.y + 10))
-            self.screen.blit(font.render("Through Wall", True, (255, 255, 255)),
+            self.screen.blit(render_text(36, "Through Wall", (255, 255, 255)),
                              (through_wall_button.x + 10, through_wall_button.y + 10))
-            self.screen.blit(font.render("Cancel All", True, (255, 255, 255)), (quit_button.x + 30, quit_button.y + 10))
-
-            pygame.display.flip()
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if e.type == pygame.MOUSEBUTTONDOWN:
-                    if blue_button.collidepoint(e.pos):
-                        self.cheat_tank_name = "Blue"
-                        return
-                    if green_button.collidepoint(e.pos):
-                        self.cheat_tank_name = "Green"
-                        return
-                    if both_button.collidepoint(e.pos):
-                        self.cheat_tank_name = "Both"
-                        return
-                    if wall_button.collidepoint(e.pos):
-                        self.cheat_wall = True
-                        return
-                    if bullet_button.collidepoint(e.pos):
-                        self.bullet_hack = True
-                        return
-                    if through_wall_button.collidepoint(e.pos):
-                        self.bullet_through_wall = True
-                        return
-                    if quit_button.collidepoint(e.pos):
-                        self.cheat_tank_name = None
-                        self.cheat_wall = False
-                        self.bullet_hack = False
-                        self.bullet_through_wall = False
-                        return
+            self.screen.blit(render_text(36, "Cancel All", (255, 255, 255)), (quit_button.x + 30, quit_button.y + 10))
+
+        def on_event(e):
+            if e.type == pygame.MOUSEBUTTONDOWN:
+                if blue_button.collidepoint(e.pos):
+                    self.cheat_tank_name = "Blue"
+                    return True
+                if green_button.collidepoint(e.pos):
+                    self.cheat_tank_name = "Green"
+                    return True
+                if both_button.collidepoint(e.pos):
+                    self.cheat_tank_name = "Both"
+                    return True
+                if wall_button.collidepoint(e.pos):
+                    self.cheat_wall = True
+                    return True
+                if bullet_button.collidepoint(e.pos):
+                    self.bullet_hack = True
+                    return True
+                if through_wall_button.collidepoint(e.pos):
+                    self.bullet_through_wall = True
+                    return True
+                if quit_button.collidepoint(e.pos):
+                    self.cheat_tank_name = None
+                    self.cheat_wall = False
+                    self.bullet_hack = False
+                    self.bullet_through_wall = False
+                    return True
+
+        self.run_menu(draw, on_event)
 
     def show_account_input(self):
         self.player_input_active = True
@@ -775,48 +1268,49 @@ class Game:
         self.player_inputs = ["", ""]
         self.confirmed = [False, False]
 
-        while not all(self.confirmed):
+        def draw():
             self.screen.fill((240, 240, 240))
-            label = load_font(40).render("Enter Player Names", True, (0, 0, 0))
+            label = render_text(40, "Enter Player Names", (0, 0, 0))
             self.screen.blit(label, label.get_rect(center=(Settings.WIDTH // 2, 120)))
 
             for i in range(2):
                 pygame.draw.rect(self.screen, (0, 0, 0), self.input_boxes[i], 2)
-                input_surface = self.input_font.render(self.player_inputs[i], True, (0, 0, 0))
+                input_surface = render_text(32, self.player_inputs[i], (0, 0, 0))
                 self.screen.blit(input_surface, (self.input_boxes[i].x + 5, self.input_boxes[i].y + 5))
 
                 pygame.draw.rect(self.screen, (0, 200, 0) if not self.confirmed[i] else (100, 100, 100),
                                  confirm_buttons[i])
-                confirm_text = self.input_font.render("Confirm", True, (255, 255, 255))
+                confirm_text = render_text(32, "Confirm", (255, 255, 255))
                 self.screen.blit(confirm_text, confirm_text.get_rect(center=confirm_buttons[i].center))
 
-            hint_font = load_font(24)
-            hint_text = hint_font.render("Press ESC to return to menu", True, (50, 50, 50))
+            hint_text = render_text(24, "Press ESC to return to menu", (50, 50, 50))
             hint_rect = hint_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 50))
             self.screen.blit(hint_text, hint_rect)
 
-            pygame.display.flip()
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.quit_game()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    for i in range(2):
-                        if self.input_boxes[i].collidepoint(event.pos):
-                            active_box = [j == i for j in range(2)]
-                        if confirm_buttons[i].collidepoint(event.pos):
-                            if self.player_inputs[i]:
-                                self.confirmed[i] = True
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.show_menu()
-                        return
-                    for i in range(2):
-                        if active_box[i] and not self.confirmed[i]:
-                            if event.key == pygame.K_BACKSPACE:
-                                self.player_inputs[i] = self.player_inputs[i][:-1]
-                            elif len(self.player_inputs[i]) < 20 and event.unicode.isprintable():
-                                self.player_inputs[i] += event.unicode
+        def on_event(event):
+            nonlocal active_box
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                for i in range(2):
+                    if self.input_boxes[i].collidepoint(event.pos):
+                        active_box = [j == i for j in range(2)]
+                    if confirm_buttons[i].collidepoint(event.pos):
+                        if self.player_inputs[i]:
+                            self.confirmed[i] = True
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    return "menu"
+                for i in range(2):
+                    if active_box[i] and not self.confirmed[i]:
+                        if event.key == pygame.K_BACKSPACE:
+                            self.player_inputs[i] = self.player_inputs[i][:-1]
+                        elif len(self.player_inputs[i]) < 20 and event.unicode.isprintable():
+                            self.player_inputs[i] += event.unicode
+            if all(self.confirmed):
+                return "confirmed"
+
+        if self.run_menu(draw, on_event) == "menu":
+            self.show_menu()
+            return
 
         self.player_names = self.player_inputs[:2]
         self.countdown()
@@ -824,7 +1318,7 @@ class Game:
     def countdown(self):
         for i in range(3, 0, -1):
             self.screen.fill((240, 240, 240))
-            text = load_font(72).render(str(i), True, (0, 0, 0))
+            text = render_text(72, str(i), (0, 0, 0))
             self.screen.blit(text, text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2)))
             pygame.display.flip()
             pygame.time.delay(1000)
@@ -833,13 +1327,196 @@ class Game:
         self.running = True
         self.winner = None
         self.restart()
+        self.start_recording()
+        self.clock.tick()
+        tick = 1 / Settings.TICK_RATE
 
         while self.running:
-            self.clock.tick(Settings.FPS)
+            # Rendering runs at FPS; logic catches up in fixed TICK_RATE steps
+            self.accumulator += min(self.clock.tick(Settings.FPS) / 1000, Settings.MAX_FRAME_TIME)
             self.handle_events()
-            if not self.winner:
-                self.update()
+            while self.accumulator >= tick:
+                self.accumulator -= tick
+                if not (self.winner or self.is_draw):
+                    self.step(pygame.key.get_pressed())
             self.draw()
+        self.stop_recording()
+
+    def step(self, keys):
+        """Advance the match by exactly one logic tick.
+
+        keys is the pressed-key mapping for this tick (indexed by pygame key
+        codes like pygame.key.get_pressed()), read by keyboard controllers.
+        Reads no events, clock or global random state, so the same seed, keys
+        and controllers always give the same match."""
+        # Every controller decides before any tank moves; the replay stores the decisions
+        controls = bytes(0 if t.destroyed else t.controller.controls(keys, t, self) for t in self.tanks)
+        if self.recorder:
+            self.recorder.record(controls)
+        for t, mask in zip(self.tanks, controls):
+            if not t.destroyed:
+                t.handle_input(mask)
+        self.update()
+        self.frame += 1
+        if self.winner or self.is_draw:
+            self.stop_recording()
+
+    def start_recording(self, path: Optional[str] = None):
+        # Only when Settings.RECORD_REPLAYS is on, unless a path is given explicitly
+        if path is None:
+            if not Settings.RECORD_REPLAYS or self.replaying:
+                return
+            os.makedirs(Settings.REPLAY_DIR, exist_ok=True)
+            path = os.path.join(Settings.REPLAY_DIR, f"match_{time.strftime('%Y%m%d_%H%M%S')}_{self.seed}.tankreplay")
+        self.stop_recording()
+        self.recorder = ReplayRecorder(path, self, Settings, snapshot_interval=Settings.REPLAY_SNAPSHOT_INTERVAL)
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def save_state(self) -> bytes:
+        """Everything step() depends on, packed with struct so keyframes stay small.
+        Settings, difficulty, cheats and names are not included; restore into a
+        game restarted with the same ones (see Replay.setup)."""
+        if self.bullet_engine is not None:
+            bullets = [(owner, x, y, x, y, vx, vy, target)
+                       for owner, x, y, vx, vy, target in self.bullet_engine.records()]
+        else:
+            bullets = [(t.player_index, b.rect.x, b.rect.y, b.prev_rect.x, b.prev_rect.y, b.vel.x, b.vel.y,
+                        b.target.player_index if b.target else -1)
+                       for t in self.tanks for b in t.bullets]
+        winner = self.tanks.index(self.winner) if self.winner else -1
+        version, mt_state, gauss = self.rng.getstate()
+        parts = [
+            self.STATE_HEADER.pack(self.frame, self.shrink_timer, self.powerup_spawn_timer, self.safe_zone_radius,
+                                   self.shrinking, self.safe_zone_visible, self.is_draw, winner,
+                                   len(self.tanks), len(bullets), len(self.powerups)),
+            self.STATE_RNG.pack(version, gauss is not None, gauss or 0.0),
+            array("I", mt_state).tobytes(),
+        ]
+        effect_ids = {name: i for i, name in enumerate(EFFECTS)}
+        for t in self.tanks:
+            parts.append(self.STATE_TANK.pack(*t.rect, t.angle, t.hp, t._reload_timer, t._hit_timer,
+                                              t.outside_safezone_cooldown, len(t.effects)))
+            parts += [self.STATE_EFFECT.pack(effect_ids[name], self.effects.remaining(t, name, self.frame))
+                      for name in t.effects]
+        parts += [self.STATE_BULLET.pack(*b) for b in bullets]
+        for powerup in self.powerups:
+            parts.append(self.STATE_POWERUP.pack(POWERUP_CLASSES.index(type(powerup)), powerup.rect.x,
+                                                 powerup.rect.y, powerup.active, powerup.effect_duration))
+        return b"".join(parts)
+
+    def load_state(self, data: bytes):
+        # Inverse of save_state(), into a game already restarted with the same settings
+        (self.frame, self.shrink_timer, self.powerup_spawn_timer, self.safe_zone_radius,
+         self.shrinking, self.safe_zone_visible, self.is_draw, winner, tank_count, bullet_count,
+         powerup_count) = self.STATE_HEADER.unpack_from(data, 0)
+        pos = self.STATE_HEADER.size
+        version, has_gauss, gauss = self.STATE_RNG.unpack_from(data, pos)
+        pos += self.STATE_RNG.size
+        mt_state = array("I")
+        mt_state.frombytes(data[pos:pos + 625 * mt_state.itemsize])
+        pos += 625 * mt_state.itemsize
+        self.rng.setstate((version, tuple(mt_state), gauss if has_gauss else None))
+
+        self.effects.clear()
+        effects = list(EFFECTS.values())
+        for t in self.tanks[:tank_count]:
+            (x, y, w, h, t.angle, t.hp, t._reload_timer, t._hit_timer, t.outside_safezone_cooldown,
+             effect_count) = self.STATE_TANK.unpack_from(data, pos)
+            pos += self.STATE_TANK.size
+            t.rect = Rect(x, y, w, h)
+            for _ in range(effect_count):
+                effect_id, remaining = self.STATE_EFFECT.unpack_from(data, pos)
+                pos += self.STATE_EFFECT.size
+                if remaining > 0:
+                    self.effects.add(t, effects[effect_id], self.frame + remaining - 1)
+            t.bullets = []
+            # Between ticks of a running match, exactly the tanks out of hp are out of play
+            t.out_frame = -1 if t.hp <= 0 else None
+            if t.destroyed:
+                self.tank_hash.remove(t)
+            else:
+                self.tank_hash.update(t)
+        self.team_tanks = Counter(t.team for t in self.tanks if not t.destroyed)
+        self.hittable = {}
+        self.winner = self.tanks[winner] if winner >= 0 else None
+
+        if self.bullet_engine is not None:
+            self.bullet_engine.clear()
+        for _ in range(bullet_count):
+            owner, x, y, px, py, vx, vy, target = self.STATE_BULLET.unpack_from(data, pos)
+            pos += self.STATE_BULLET.size
+            tank = self.tanks[owner]
+            if self.bullet_engine is not None:
+                self.bullet_engine.add(x, y, vx, vy, owner, tank.color, target)
+            else:
+                b = Bullet(Vector2(x, y), Vector2(0, 0), tank.color, self.tanks[target] if target >= 0 else None)
+                b.vel = Vector2(vx, vy)
+                b.prev_rect = Rect(px, py, b.rect.width, b.rect.height)
+                tank.bullets.append(b)
+
+        self.powerups = []
+        self.powerup_hash.clear()
+        self.powerup_space.clear()
+        for _ in range(powerup_count):
+            kind, x, y, active, duration = self.STATE_POWERUP.unpack_from(data, pos)
+            pos += self.STATE_POWERUP.size
+            powerup = POWERUP_CLASSES[kind]((x, y), duration)
+            powerup.active = active
+            self.powerups.append(powerup)
+            self.powerup_hash.insert(powerup)
+            self.powerup_space.block(powerup, powerup.rect)
+
+    def play_replay(self, path: str, speed: Optional[float] = 1, start_frame: int = 0):
+        """Re-run a recorded match. speed is a multiple of real time (1, 10, ...);
+        None, 0 or a headless game simulate as fast as possible without drawing.
+        start_frame seeks there first through the replay's keyframes."""
+        replay = Replay.load(path)
+        self.replaying = True
+        replay.setup(self, Settings)
+        replay.seek(self, start_frame)
+        # Every tank follows its ReplayController, so no keys are needed
+        idle_keys = defaultdict(bool)
+        try:
+            if self.headless or not speed:
+                for frame in range(self.frame, len(replay)):
+                    self.step(idle_keys)
+                return
+
+            self.running = True
+            frame = self.frame
+            budget = 0.0
+            while self.running:
+                self.clock.tick(Settings.FPS)
+                for e in pygame.event.get():
+                    if e.type == pygame.QUIT:
+                        self.quit_game()
+                    elif e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
+                        self.running = False
+                budget += speed * Settings.TICK_RATE / Settings.FPS
+                while budget >= 1 and frame < len(replay):
+                    budget -= 1
+                    self.step(idle_keys)
+                    frame += 1
+                self.draw()
+        finally:
+            self.replaying = False
+
+    def run_headless(self, max_frames: int, get_keys=None):
+        """Simulate a match without a display, clock throttling or drawing.
+
+        get_keys(game) returns the pressed-key mapping for this frame (indexed
+        by pygame key codes like pygame.key.get_pressed()); no keys are pressed
+        when it is None. Returns the number of frames simulated."""
+        idle_keys = defaultdict(bool)
+        frame = 0
+        while frame < max_frames and not (self.winner or self.is_draw):
+            self.step(get_keys(self) if get_keys else idle_keys)
+            frame += 1
+        return frame
 
     def handle_events(self):
         for e in pygame.event.get():
@@ -848,18 +1525,14 @@ class Game:
             elif e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_ESCAPE:
                     self.running = False
-                if self.winner and e.key == pygame.K_r:
+                if (self.winner or self.is_draw) and e.key == pygame.K_r:
                     self.restart()
                     self.winner = None
+                    self.start_recording()
             elif e.type == pygame.MOUSEBUTTONDOWN:
                 if hasattr(self, "back_rect") and self.back_rect.collidepoint(e.pos):
                     self.running = False
 
-        if not self.winner:
-            keys = pygame.key.get_pressed()
-            for t in self.tanks:
-                t.handle_input(keys)
-
     def update(self):
         self.shrink_timer += 1
         # Handle powerup spawning
@@ -875,105 +1548,199 @@ class Game:
         if self.shrinking:
             self.safe_zone_radius = max(50, self.safe_zone_radius - 0.1)
 
+        # Tanks only move in handle_input(), so every bullet this tick sees the same rects
+        self.tank_rects = [t.rect for t in self.tanks]
+        ending = self.effects.pop_due(self.frame)
         for t in self.tanks:
+            if t.destroyed:
+                t.update_bullets()
+                continue
             t.update()
+            # Effects run out after their tank's turn, so its bullets this tick still had them
+            if t in ending:
+                self.effects.end(t, ending.pop(t))
+            # A tank leaves once its own turn shows it out of hp; the last team standing wins right away
             if t.hp <= 0:
-                self.winner = self.get_other_tank(t)
-                break
+                self.knock_out(t)
+                if self.check_last_standing():
+                    break
+        for t, names in ending.items():
+            self.effects.end(t, names)
 
         for t in self.tanks:
+            if t.destroyed:
+                continue
             distance = Vector2(t.rect.center).distance_to(self.safe_zone_center)
             if distance > self.safe_zone_radius and t.hp > 0:
                 if t.outside_safezone_cooldown <= 0:
                     t.hp -= 1
-                    t.outside_safezone_cooldown = Settings.FPS
-
-        blue_dead = self.tanks[0].hp <= 0
-        green_dead = self.tanks[1].hp <= 0
-        if blue_dead and green_dead and not self.winner:
-            self.is_draw = True
-        elif blue_dead and not self.winner:
-            self.winner = self.tanks[1]
-        elif green_dead and not self.winner:
-            self.winner = self.tanks[0]
-        
-        for powerup in self.powerups[:]:
-            for tank in self.tanks:
-                if powerup.active and tank.rect.colliderect(powerup.rect):
+                    t.outside_safezone_cooldown = Settings.TICK_RATE
+
+        if not (self.winner or self.is_draw):
+            # Everyone who ran out of hp after their turn goes together, so they can all draw
+            fallen = [t for t in self.tanks if t.hp <= 0 and not t.destroyed]
+            for t in fallen:
+                self.knock_out(t)
+            if fallen:
+                self.check_last_standing()
+
+        for tank in self.tanks:
+            if tank.destroyed:
+                continue
+            for powerup in self.powerup_hash.query(tank.rect):
+                if powerup.active:
                     powerup.apply(tank)
+                    if powerup.effect:
+                        self.effects.add(tank, EFFECTS[powerup.effect], self.frame + powerup.effect_duration)
                     powerup.active = False
                     self.powerups.remove(powerup)
+                    self.powerup_hash.remove(powerup)
+                    self.powerup_space.unblock(powerup)
 
 
     def spawn_powerup(self):
+        # A random free spot inside the safe zone and clear of the tanks, skipped only when there is none left
+        if not Settings.FREE_SPACE_SPAWNS:
+            self._spawn_powerup_by_retries()
+            return
+        cx, cy = self.safe_zone_center
+        radius = self.safe_zone_radius
+        zone = Rect(cx - radius, cy - radius, 2 * radius, 2 * radius).clip(self.world_rect)
+        clearance = Rect(0, 0, POWERUP_SIZE + 2 * Settings.POWERUP_TANK_CLEARANCE,
+                         POWERUP_SIZE + 2 * Settings.POWERUP_TANK_CLEARANCE)
+
+        def accept(x, y):
+            clearance.center = x, y
+            return (x - cx) ** 2 + (y - cy) ** 2 <= radius ** 2 and not self.tank_hash.collides(clearance)
+
+        spot = self.powerup_space.sample(self.rng, accept, zone)
+        if spot is None:
+            return
+        rect = Rect(0, 0, POWERUP_SIZE, POWERUP_SIZE)
+        rect.center = spot
+        new_powerup = random_powerup(rect.topleft, self.rng)
+        self.powerups.append(new_powerup)
+        self.powerup_hash.insert(new_powerup)
+        self.powerup_space.block(new_powerup, new_powerup.rect)
+
+    def _spawn_powerup_by_retries(self):
         max_attempts = 50  # Prevent infinite loops & only allowed to find a spawn spot 50 times
+        regions = self.powerup_regions
+        areas = [r.width * r.height for r in regions]  # bigger regions get proportionally more powerups
         for _ in range(max_attempts):
-            x = random.randint(50, Settings.WIDTH - 90)
-            y = random.randint(50, Settings.HEIGHT - 90)
+            region = regions[0] if len(regions) == 1 else self.rng.choices(regions, areas)[0]
+            x = self.rng.randint(region.left, region.right - 40)
+            y = self.rng.randint(region.top, region.bottom - 40)
             new_rect = pygame.Rect(x, y, 40, 40)
 
             # Check if it collides with any obstacle, if not, spawn
-            if all(not new_rect.colliderect(ob.rect) for ob in self.obstacles):
-                new_powerup = random_powerup((x, y))
+            if not self.obstacle_hash.collides(new_rect):
+                new_powerup = random_powerup((x, y), self.rng)
                 self.powerups.append(new_powerup)
+                self.powerup_hash.insert(new_powerup)
                 return
         # If no valid spot found after max_attempts, skip spawning
 
 
-    def draw(self):
-        self.screen.fill(Settings.BG_COLOR)
+    def draw_view(self, camera: Camera) -> List[Rect]:
+        # Draws the moving parts of the world inside camera's view; returns the screen rects touched
+        view, offset = camera.view, camera.offset
+        drawn = []
         if self.safe_zone_visible:
-            pygame.draw.circle(self.screen, (0, 0, 255), self.safe_zone_center, int(self.safe_zone_radius), 2)
-
-        for ob in self.obstacles:
-            ob.draw(self.screen)
+            drawn.append(pygame.draw.circle(self.screen, (0, 0, 255), self.safe_zone_center + Vector2(offset),
+                                            int(self.safe_zone_radius), 2))
 
         for t in self.tanks:
-            t.draw(self.screen)
+            if not t.destroyed and t.bounds().colliderect(view):
+                drawn.append(t.draw(self.screen, offset))
+            # Bullets move every tick, so they are culled with a plain rect test instead of a hash
             for b in t.bullets:
-                b.draw(self.screen)
+                if b.rect.colliderect(view):
+                    drawn.append(b.draw(self.screen, offset))
+        if self.bullet_engine is not None:
+            ox, oy = offset
+            for x, y, w, h, color in self.bullet_engine.rects(area=view):
+                drawn.append(pygame.draw.rect(self.screen, color, (x + ox, y + oy, w, h)))
 
-        for powerup in self.powerups:
-            powerup.draw(self.screen)
+        for powerup in self.powerup_hash.query(view):
+            drawn.append(powerup.draw(self.screen, offset))
+        return drawn
 
-        if (self.winner or self.is_draw) and not self.is_restarting:
-            self.save_score_to_csv()
+    def draw(self):
+        self.update_cameras()
+        moved = self.build_arena_layer()
+        if self.full_redraw:
+            self.screen.blit(self.arena_layer, (0, 0))
+        else:
+            # Erase last frame's sprites by restoring the arena underneath them, and
+            # copy over the whole view of each camera that moved
+            for r in self.dirty_rects + moved:
+                self.screen.blit(self.arena_layer, r, r)
+
+        drawn = []
+        for camera in self.cameras:
+            # Clipping keeps each view's sprites out of the other view, and clips the rects draw returns
+            self.screen.set_clip(camera.viewport)
+            drawn += self.draw_view(camera)
+        self.screen.set_clip(None)
+
+        if (self.winner or self.is_draw) and not self.is_restarting and not self.replaying:
+            self.save_score()
             self.is_restarting = True
 
         if self.winner or self.is_draw:
             if self.is_draw:
                 msg = "Draw!"
                 color = (128, 128, 128)
+            elif Settings.TEAM_COUNT >= 2:
+                msg = f"Team {self.winner.team + 1} Wins!"
+                color = self.winner.color
             else:
                 msg = f"{self.winner.name} Tank Wins!"
                 color = (220, 20, 60)
 
-            font = load_font(Settings.FONT_SIZE)
-            text = font.render(msg, True, (255, 255, 255))
+            text = render_text(Settings.FONT_SIZE, msg, (255, 255, 255))
             rect = text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2))
 
             padding = 20
             bg_rect = pygame.Rect(rect.left - padding, rect.top - padding,
                                   rect.width + padding * 2, rect.height + padding * 2)
-            pygame.draw.rect(self.screen, color, bg_rect, border_radius=10)
+            drawn.append(pygame.draw.rect(self.screen, color, bg_rect, border_radius=10))
             pygame.draw.rect(self.screen, (0, 0, 0), bg_rect, width=5, border_radius=10)
             self.screen.blit(text, rect)
 
-            restart_text = load_font(32).render("Press R to Restart", True, (200, 200, 200))
+            restart_text = render_text(32, "Press R to Restart", (200, 200, 200))
             restart_rect = restart_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2 + 60))
-            self.screen.blit(restart_text, restart_rect)
+            drawn.append(self.screen.blit(restart_text, restart_rect))
 
-            menu_text = load_font(32).render("Press ESC for Menu", True, (200, 200, 200))
+            menu_text = render_text(32, "Press ESC for Menu", (200, 200, 200))
             menu_rect = menu_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2 + 100))
-            self.screen.blit(menu_text, menu_rect)
+            drawn.append(self.screen.blit(menu_text, menu_rect))
 
-        font = load_font(24)
-        back_text = font.render("Menu", True, (0, 0, 0))
+        back_text = render_text(24, "Menu", (0, 0, 0))
         self.back_rect = back_text.get_rect(topright=(Settings.WIDTH - 20, 20))
-        pygame.draw.rect(self.screen, (200, 200, 200), self.back_rect.inflate(10, 10))
+        drawn.append(pygame.draw.rect(self.screen, (200, 200, 200), self.back_rect.inflate(10, 10)))
         self.screen.blit(back_text, self.back_rect)
 
-        pygame.display.flip()
+        self.present(drawn, moved)
+
+    def present(self, drawn: List[Rect], moved: List[Rect] = ()):
+        """Push only the regions that changed since the last frame to the display.
+
+        drawn holds the rects touched this frame; together with last frame's
+        rects and the viewports of cameras that moved (moved) they cover every
+        pixel that can differ. Falls back to a full flip when the dirty regions
+        are too many or too large to be worth it."""
+        screen_rect = self.screen.get_rect()
+        rects = [r.clip(screen_rect) for r in self.dirty_rects + drawn + list(moved)]
+        dirty_area = sum(r.width * r.height for r in rects)
+        if (self.full_redraw or len(rects) > Settings.DIRTY_RECT_LIMIT
+                or dirty_area > screen_rect.width * screen_rect.height * Settings.DIRTY_AREA_LIMIT):
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        self.dirty_rects = drawn
+        self.full_redraw = False
 
     def run(self):
         while True:
@@ -981,5 +1748,75 @@ class Game:
             self.game_loop()
 
 
+_worker_game = None
+
+
+def play_tournament_match(player1: str, player2: str, seed: int, difficulty: int = 0,
+                          max_frames: int = 5 * 60 * Settings.TICK_RATE) -> MatchResult:
+    # Runs inside a tournament worker process; each process keeps one headless Game
+    global _worker_game
+    if _worker_game is None:
+        _worker_game = Game(headless=True)
+    game = _worker_game
+    game.difficulty = difficulty
+    game.player_names = [player1, player2]
+    game.restart(seed=seed)
+    for i, t in enumerate(game.tanks):
+        t.controller = RandomBot(seed + i)
+    frames = game.run_headless(max_frames)
+    if game.winner:
+        return MatchResult((player1, player2), game.winner.name, game.winner.hp, frames, seed)
+    return MatchResult((player1, player2), None, 0, frames, seed)
+
+
+def run_tournament(players: List[str], fmt: str, difficulty: int = 0, processes: Optional[int] = None,
+                   base_seed: int = 0) -> Tournament:
+    tournament = Tournament(players, fmt, partial(play_tournament_match, difficulty=difficulty),
+                            processes=processes, base_seed=base_seed)
+    results = tournament.run()
+    # One scoreboard write for the whole tournament
+    update_scoreboard([(*r.players, r.winner, r.remaining_hp) for r in results])
+    return tournament
+
+
 if __name__ == "__main__":
-    Game().run()
+    if len(sys.argv) > 1 and sys.argv[1] == "--headless":
+        # Batch balancing: python "Tank_game beta6.0.py" --headless [frames]
+        max_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        game = Game(headless=True)
+        start = time.perf_counter()
+        frames = game.run_headless(max_frames)
+        elapsed = time.perf_counter() - start
+        result = "Draw" if game.is_draw else (game.winner.name if game.winner else "None")
+        print(f"{frames} frames in {elapsed:.2f}s ({frames / max(elapsed, 1e-9):.0f} fps), winner: {result}")
+    elif len(sys.argv) > 3 and sys.argv[1] == "--tournament":
+        # python "Tank_game beta6.0.py" --tournament round-robin|swiss|single-elim NAME NAME [NAME ...]
+        start = time.perf_counter()
+        tournament = run_tournament(sys.argv[3:], sys.argv[2])
+        elapsed = time.perf_counter() - start
+        print(f"{len(tournament.results)} matches in {elapsed:.1f}s on {os.cpu_count()} cores")
+        for name, points in tournament.standings():
+            print(f"{name}: {points}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "--recompute-ratings":
+        # python "Tank_game beta6.0.py" --recompute-ratings [database]
+        board = Scoreboard(sys.argv[2] if len(sys.argv) > 2 else Settings.SCOREBOARD_PATH)
+        start = time.perf_counter()
+        count = board.recompute_ratings()
+        board.close()
+        print(f"Recomputed ratings from {count} matches in {time.perf_counter() - start:.2f}s")
+    elif len(sys.argv) > 2 and sys.argv[1] == "--replay":
+        # python "Tank_game beta6.0.py" --replay file.tankreplay [speed|max] [start frame]
+        speed = sys.argv[3] if len(sys.argv) > 3 else "1"
+        start_frame = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        game = Game(headless=speed == "max")
+        game.play_replay(sys.argv[2], None if speed == "max" else float(speed), start_frame)
+        result = "Draw" if game.is_draw else (game.winner.name if game.winner else "None")
+        print(f"Replayed {game.frame} frames, winner: {result}")
+    elif len(sys.argv) > 2 and sys.argv[1] == "--map":
+        # python "Tank_game beta6.0.py" --map file.json|file.toml: play that map at every difficulty
+        Settings.MAP_FILE = sys.argv[2]
+        import_legacy_scores()
+        Game().run()
+    else:
+        import_legacy_scores()
+        Game().run()
@@ -0,0 +1,203 @@
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, Game falls back to Bullet objects without it
+    np = None
+
+
+def round_rect_coord(v):
+    # Assigning a float to Rect.x rounds half away from zero
+    whole = np.trunc(v)
+    frac = v - whole
+    return (whole + np.sign(frac) * (np.abs(frac) >= 0.5)).astype(np.int64)
+
+
+def sweep_boxes(x, y, dx, dy, size, left, top, width, height):
+    """Batched spatial.sweep_rect(): a size x size box moving from (x, y) by (dx, dy)
+    against the rect (left, top, width, height). All arguments broadcast against
+    each other; returns the hit time of every pair, or inf where they never touch."""
+    enter, leave = -np.inf, np.inf
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for pos, delta, lo, hi in ((x, dx, left - size, left + width), (y, dy, top - size, top + height)):
+            pos = np.asarray(pos, dtype=np.float64)
+            delta = np.asarray(delta, dtype=np.float64)
+            t1 = (lo - pos) / delta
+            t2 = (hi - pos) / delta
+            still = delta == 0
+            inside = (lo < pos) & (pos < hi)
+            # A box not moving on this axis overlaps forever or never
+            t_lo = np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+            t_hi = np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+            enter = np.maximum(enter, t_lo)
+            leave = np.minimum(leave, t_hi)
+    hit = (enter < leave) & (enter < 1) & (leave > 0)
+    return np.where(hit, np.maximum(enter, 0.0), np.inf)
+
+
+class BulletEngine:
+    #Structure-of-arrays bullet storage: every bullet is one slot in a set of NumPy arrays
+    available = np is not None
+
+    def __init__(self, size, speed, width, height, capacity=256, swept=True):
+        """size/speed: Settings.BULLET_SIZE and BULLET_SPEED
+        width/height: the world, bullets leaving it are removed like Bullet.is_out_of_world()
+        swept: test the whole segment moved each frame (Settings.SWEPT_COLLISION)"""
+        self.size = size
+        self.swept = swept
+        self.speed = speed
+        self.width = width
+        self.height = height
+        self.count = 0
+        # Positions are whole pixels like pygame.Rect, velocities are floats like Vector2
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.vx = np.zeros(capacity, dtype=np.float64)
+        self.vy = np.zeros(capacity, dtype=np.float64)
+        self.owner = np.zeros(capacity, dtype=np.int16)
+        self.color = np.zeros(capacity, dtype=np.int16)
+        self.target = np.full(capacity, -1, dtype=np.int16)  # tank index or -1 for straight bullets
+        self.colors = []  # palette that color indexes point into
+        self.obstacles = np.zeros((0, 4), dtype=np.int64)
+
+    def set_obstacles(self, rects):
+        self.obstacles = np.array([tuple(r) for r in rects], dtype=np.int64).reshape(-1, 4)
+
+    def clear(self):
+        self.count = 0
+
+    def _grow(self):
+        for name in ("x", "y", "vx", "vy", "owner", "color", "target"):
+            old = getattr(self, name)
+            new = np.full(len(old) * 2, -1 if name == "target" else 0, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def spawn(self, pos, direction, owner, color, target=-1):
+        """pos: Vector2 top-left corner, direction: unit Vector2,
+        owner/target: tank indexes, color: (r, g, b)"""
+        vel = direction * self.speed
+        # Same truncation as Rect(pos.x, pos.y, ...) in Bullet.__init__
+        self.add(int(pos.x), int(pos.y), vel.x, vel.y, owner, color, target)
+
+    def add(self, x, y, vx, vy, owner, color, target=-1):
+        #Append one bullet from raw values, e.g. when restoring a saved state
+        if self.count == len(self.x):
+            self._grow()
+        if color not in self.colors:
+            self.colors.append(color)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.owner[i] = owner
+        self.color[i] = self.colors.index(color)
+        self.target[i] = target
+        self.count += 1
+
+    def owned_by(self, owner):
+        return np.flatnonzero(self.owner[:self.count] == owner)
+
+    def _first_hit(self, x, y, dx, dy, rects):
+        """For every bullet moving from (x, y) by (dx, dy), the earliest hit time
+        against any of rects, or inf when it hits none."""
+        if len(rects) == 0:
+            return np.full(len(x), np.inf)
+        times = sweep_boxes(x[:, None], y[:, None], dx[:, None], dy[:, None], self.size,
+                            rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3])
+        return times.min(axis=1)
+
+    def update_owner(self, owner, tank_rects, hittable=None):
+        """Advance every bullet fired by tank `owner` by one frame, like Bullet.update()
+        followed by the checks in Tank.update(), and compact dead bullets out.
+
+        tank_rects: (x, y, w, h) of every tank, indexed like the owner/target ids.
+        hittable: per tank, whether these bullets can hit it and keep homing in on
+        it (enemies still in the match); every tank but the owner by default.
+        Returns the index of the tank each bullet that hit one this frame hit."""
+        idx = self.owned_by(owner)
+        if len(idx) == 0:
+            return []
+        tanks = np.array([tuple(r) for r in tank_rects], dtype=np.int64).reshape(-1, 4)
+        if hittable is None:
+            hittable = np.arange(len(tanks)) != owner
+        else:
+            hittable = np.asarray(hittable, dtype=bool)
+        half = self.size // 2
+        x, y = self.x[idx], self.y[idx]
+        vx, vy = self.vx[idx], self.vy[idx]
+
+        # Homing bullets re-aim at their target's center every frame
+        target = self.target[idx]
+        homing = target >= 0
+        homing[homing] = hittable[target[homing]]
+        if homing.any():
+            t = tanks[target[homing]]
+            dx = (t[:, 0] + t[:, 2] // 2 - (x[homing] + half)).astype(np.float64)
+            dy = (t[:, 1] + t[:, 3] // 2 - (y[homing] + half)).astype(np.float64)
+            length = np.sqrt(dx * dx + dy * dy)
+            moving = length > 0
+            steer = np.flatnonzero(homing)[moving]
+            vx[steer] = dx[moving] / length[moving] * self.speed
+            vy[steer] = dy[moving] / length[moving] * self.speed
+            self.vx[idx] = vx
+            self.vy[idx] = vy
+
+        start_x, start_y = x, y
+        x = round_rect_coord(x + vx)
+        y = round_rect_coord(y + vy)
+        self.x[idx] = x
+        self.y[idx] = y
+
+        if self.swept:
+            sx, sy, dx, dy = start_x, start_y, x - start_x, y - start_y
+        else:
+            sx, sy, dx, dy = x, y, np.zeros_like(x), np.zeros_like(y)
+        # Only obstacles overlapping the box around every bullet's move can be hit; on big maps
+        # that is a handful out of thousands
+        obstacles = self.obstacles
+        if len(obstacles):
+            s = self.size
+            lo_x, hi_x = min(sx.min(), (sx + dx).min()), max(sx.max(), (sx + dx).max()) + s
+            lo_y, hi_y = min(sy.min(), (sy + dy).min()), max(sy.max(), (sy + dy).max()) + s
+            obstacles = obstacles[(obstacles[:, 0] <= hi_x) & (obstacles[:, 0] + obstacles[:, 2] >= lo_x) &
+                                  (obstacles[:, 1] <= hi_y) & (obstacles[:, 1] + obstacles[:, 3] >= lo_y)]
+        obstacle_time = self._first_hit(sx, sy, dx, dy, obstacles)
+        enemies = np.flatnonzero(hittable)
+        if len(enemies):
+            times = sweep_boxes(sx[:, None], sy[:, None], dx[:, None], dy[:, None], self.size,
+                                tanks[enemies, 0], tanks[enemies, 1], tanks[enemies, 2], tanks[enemies, 3])
+            first = times.argmin(axis=1)
+            tank_time = times[np.arange(len(idx)), first]
+        else:
+            first = np.zeros(len(idx), dtype=np.int64)
+            tank_time = np.full(len(idx), np.inf)
+
+        s = self.size
+        outside = (x + s < 0) | (x > self.width) | (y + s < 0) | (y > self.height)
+        # Same precedence as Tank.update: a tank reached before any wall takes the hit
+        hit = tank_time < obstacle_time
+        remove = hit | outside | np.isfinite(obstacle_time)
+        if remove.any():
+            keep = np.ones(self.count, dtype=bool)
+            keep[idx[remove]] = False
+            n = int(keep.sum())
+            for name in ("x", "y", "vx", "vy", "owner", "color", "target"):
+                arr = getattr(self, name)
+                arr[:n] = arr[:self.count][keep]
+            self.count = n
+        return enemies[first[hit]].tolist() if len(enemies) else []
+
+    def records(self):
+        #(owner, x, y, vx, vy, target) of every live bullet, in storage order
+        n = self.count
+        return list(zip(self.owner[:n].tolist(), self.x[:n].tolist(), self.y[:n].tolist(),
+                        self.vx[:n].tolist(), self.vy[:n].tolist(), self.target[:n].tolist()))
+
+    def rects(self, owner=None, area=None):
+        #(x, y, w, h, color) of live bullets, optionally only those of one tank or overlapping area (a Rect)
+        idx = np.arange(self.count) if owner is None else self.owned_by(owner)
+        s = self.size
+        if area is not None:
+            x, y = self.x[idx], self.y[idx]
+            idx = idx[(x < area.right) & (x + s > area.left) & (y < area.bottom) & (y + s > area.top)]
+        return [(int(self.x[i]), int(self.y[i]), s, s, self.colors[self.color[i]]) for i in idx.tolist()]
@@ -0,0 +1,27 @@
+from pygame import Rect
+
+
+class Camera:
+    #One viewport onto the world: which part of the map is shown, and where on the screen
+    def __init__(self, viewport, world):
+        """viewport: screen Rect this camera draws into, world: Rect of the whole map.
+        The view (world area shown) is the viewport's size and never leaves the world."""
+        self.viewport = Rect(viewport)
+        self.world = Rect(world)
+        self.view = Rect(0, 0, self.viewport.width, self.viewport.height)
+        self.view.clamp_ip(self.world)
+
+    def follow(self, points):
+        #Center the view on the box around points (world coordinates), kept inside the world
+        if not points:
+            return
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        self.view.center = ((min(xs) + max(xs)) // 2, (min(ys) + max(ys)) // 2)
+        # A world smaller than the view ends up centered in it
+        self.view.clamp_ip(self.world)
+
+    @property
+    def offset(self):
+        #Add to a world position to get its screen position
+        return self.viewport.x - self.view.x, self.viewport.y - self.view.y
@@ -0,0 +1,130 @@
+import math
+import random
+
+from replay import CONTROLS
+
+# A tank's controls for one tick are a bitmask, the same one replays store
+UP, DOWN, LEFT, RIGHT, SHOOT = (1 << CONTROLS.index(c) for c in ("up", "down", "left", "right", "shoot"))
+# Movement bits per 45 degree heading, counter-clockwise from 0 = right like Tank.angle
+HEADING_BITS = (RIGHT, RIGHT | UP, UP, UP | LEFT, LEFT, LEFT | DOWN, DOWN, DOWN | RIGHT)
+
+
+class Controller:
+    #Decides what a tank does each tick; Game.step() asks every tank's controller before moving any of them
+    def controls(self, keys, tank, game) -> int:
+        """keys: the pressed-key mapping of this tick, tank: the tank being driven,
+        game: the running Game. Returns a bitmask of UP, DOWN, LEFT, RIGHT and SHOOT."""
+        raise NotImplementedError
+
+
+class KeyboardController(Controller):
+    #A human player: reads the tank's keys from the pressed-key mapping
+    def __init__(self, keymap):
+        self.keymap = keymap  # control name -> pygame key code
+
+    def controls(self, keys, tank, game):
+        mask = 0
+        for bit, control in enumerate(CONTROLS):
+            if keys[self.keymap[control]]:
+                mask |= 1 << bit
+        return mask
+
+
+class RandomBot(Controller):
+    #Stand-in opponent for headless matches: wanders in random directions and fires whenever it can
+    def __init__(self, seed, turn_interval=30):
+        self.rng = random.Random(seed)
+        self.turn_interval = turn_interval
+        self.held = 0
+
+    def controls(self, keys, tank, game):
+        if game.frame % self.turn_interval == 0:
+            self.held = 0
+            for bit in (UP, DOWN, LEFT, RIGHT):
+                if self.rng.random() < 0.4:
+                    self.held |= bit
+        return self.held | SHOOT
+
+
+def _heading_to(dx, dy):
+    # Nearest of the eight headings towards (dx, dy) in screen coordinates
+    return round(math.degrees(math.atan2(-dy, dx)) / 45) % 8
+
+
+class AIController(Controller):
+    #Hunts the nearest enemy along game.nav_grid and fires once game.can_see() it
+    LONG_PATH = 64  # cells; longer than any route across the built-in 1200x900 layouts
+    def __init__(self, speed, engage_range=300, max_nodes=2048):
+        """speed: pixels the tank moves per tick (Settings.TANK_SPEED),
+        engage_range: with a clear shot, stop closing in at this distance,
+        max_nodes: A* budget per plan (see NavGrid.find_path); far targets on big
+        maps get a partial path towards them instead of a search over the whole map"""
+        self.slack = max(1, speed // 2)
+        self.engage_range = engage_range
+        self.max_nodes = max_nodes
+        self.goal = None
+        self.planned_from = None
+        self.path = []
+
+    def controls(self, keys, tank, game):
+        grid = game.nav_grid
+        target = game.nearest_enemy(tank)
+        if target is None:
+            return 0
+        x, y = tank.rect.center
+        tx, ty = target.rect.center
+        here, there = grid.cell((x, y)), grid.cell((tx, ty))
+
+        if game.can_see(tank, target):
+            heading = _heading_to(tx - x, ty - y)
+            # Tank.angle is off by float noise at most, so compare against whole headings
+            facing = round(tank.angle / 45) % 8 == heading
+            if facing and math.hypot(tx - x, ty - y) <= self.engage_range:
+                return SHOOT
+            # Moving turns the tank first, so the shot goes out along the new heading
+            return HEADING_BITS[heading] | SHOOT
+        here = grid.nearest_walkable(here)
+        if here is None:
+            return 0  # a tank too big for any cell of this layout
+        return self._follow_path(grid, x, y, here, there)
+
+    def _follow_path(self, grid, x, y, here, there):
+        # The A* result is reused until the target moves to another cell or we wander off the path
+        if self.path and self.path[-1] != grid.nearest_walkable(self.goal):
+            # The budget ran out short of the target: follow the path to its end whatever the target does.
+            # Cutting a corner off it is not worth another search, just step back onto it.
+            if here not in self.path:
+                cols = grid.cols
+                for k in range(min(len(self.path), 3) - 1, -1, -1):
+                    cell = self.path[k]
+                    if max(abs(cell % cols - here % cols), abs(cell // cols - here // cols)) == 1:
+                        self.path = [here] + self.path[k:]
+                        break
+            stale = here == self.path[-1]
+        elif there != self.goal and len(self.path) > self.LONG_PATH:
+            # Far away, the target has to stray an eighth of the path's length before it is worth a new plan
+            cols = grid.cols
+            drift = max(abs(there % cols - self.goal % cols), abs(there // cols - self.goal // cols))
+            stale = drift > len(self.path) // 8
+        else:
+            stale = there != self.goal
+        if stale or (here not in self.path and here != self.planned_from):
+            self.goal = there
+            self.planned_from = here
+            self.path = grid.find_path(here, there, self.max_nodes)
+        if not self.path:
+            return 0
+        if here in self.path:
+            self.path = self.path[self.path.index(here):]
+        wx, wy = grid.center(self.path[1] if len(self.path) > 1 else self.path[0])
+        # Within half a step of the waypoint on an axis counts as there, so tanks don't jitter
+        mask = 0
+        if wx - x > self.slack:
+            mask |= RIGHT
+        elif x - wx > self.slack:
+            mask |= LEFT
+        if wy - y > self.slack:
+            mask |= DOWN
+        elif y - wy > self.slack:
+            mask |= UP
+        return mask
@@ -0,0 +1,111 @@
+import heapq
+from itertools import count
+
+import pygame
+
+
+class Effect:
+    #A timed effect a powerup puts on a tank. Tank only asks its active effects through
+    # these hooks, so a new kind is a registered subclass and needs no Tank changes.
+    name = ""
+    blocks_damage = False  # hits take no hp while it is on
+    homing = False  # the tank's bullets chase the nearest enemy
+
+    def apply(self, tank):
+        #Called once when the effect starts; picking it up again while it is on only extends it
+        pass
+
+    def expire(self, tank):
+        #Called once when it runs out
+        pass
+
+    def shot_angles(self, angles):
+        #Degrees off the tank's heading of the bullets each shot adds to the main one; (0,) by default
+        return angles
+
+    def draw(self, tank, surf, rect):
+        #Extra drawing over the tank at screen rect; returns the Rect drawn, or None
+        return None
+
+
+# effect name -> the Effect instance every tank shares; powerups name theirs (see powerups.py).
+# The registration order is also the effect id in saved game states.
+EFFECTS = {}
+
+
+def register(cls):
+    #Class decorator adding an Effect subclass to EFFECTS under its name
+    EFFECTS[cls.name] = cls()
+    return cls
+
+
+@register
+class HomingBullets(Effect):
+    name = "homing_bullet"
+    homing = True
+
+
+@register
+class DoubleShot(Effect):
+    name = "double_shot"
+
+    def shot_angles(self, angles):
+        return -10, 10
+
+
+@register
+class Shield(Effect):
+    name = "shield"
+    blocks_damage = True
+
+    def draw(self, tank, surf, rect):
+        # Light blue bubble ring around the tank
+        return pygame.draw.circle(surf, (135, 206, 250), rect.center, max(rect.width, rect.height) // 2 + 15, 4)
+
+
+class EffectScheduler:
+    #Every timed effect of a match in one min-heap by the tick it ends on, so a tick
+    # only pays for the effects that end on it, not for every one that is active
+    def __init__(self):
+        self.heap = []  # (last tick, sequence, tank, effect name); sequence breaks ties
+        self.until = {}  # (tank, effect name) -> last tick of the effect that is really on
+        self._sequence = count()
+
+    def add(self, tank, effect, until):
+        """Put effect on tank through tick until (inclusive). Already on, the new end
+        replaces the old one; the old heap entry is left to be skipped when popped."""
+        key = (tank, effect.name)
+        started = key not in self.until
+        if self.until.get(key) == until:
+            return  # picked up twice in one tick: one heap entry per end is enough
+        self.until[key] = until
+        heapq.heappush(self.heap, (until, next(self._sequence), tank, effect.name))
+        if started:
+            tank.effects[effect.name] = effect
+            effect.apply(tank)
+
+    def remaining(self, tank, name, frame):
+        #Ticks from frame on that the effect is still on, 0 if it isn't
+        until = self.until.get((tank, name))
+        return 0 if until is None else max(0, until - frame + 1)
+
+    def pop_due(self, frame):
+        #{tank: [effect names]} of the effects whose last tick is frame or earlier; end() them
+        due = {}
+        while self.heap and self.heap[0][0] <= frame:
+            until, _, tank, name = heapq.heappop(self.heap)
+            if self.until.get((tank, name)) == until:
+                due.setdefault(tank, []).append(name)
+        return due
+
+    def end(self, tank, names):
+        for name in names:
+            del self.until[(tank, name)]
+            tank.effects.pop(name).expire(tank)
+
+    def clear(self):
+        #Drop every effect without calling expire(), for restoring a saved state
+        for tank, name in self.until:
+            tank.effects.pop(name, None)
+        self.heap.clear()
+        self.until.clear()
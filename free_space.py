@@ -0,0 +1,119 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from pygame import Rect
+
+
+def clear_cells(obstacles, areas, width, height, size, cell_size):
+    """Sorted numbers (cy * cols + cx) of the cells of a width x height grid of
+    cell_size cells where a size (w, h) box centered on the cell's center lies
+    wholly inside one of areas (Rects) and overlaps no obstacle."""
+    cols = max(1, width // cell_size)
+    rows = max(1, height // cell_size)
+    cs = cell_size
+    body = Rect(0, 0, *size)
+    # The box's left edge is x * cs + cs // 2 - w // 2, so each area takes a run of columns in a run of rows
+    offset_x, offset_y = cs // 2 - body.width // 2, cs // 2 - body.height // 2
+    flags = bytearray(cols * rows)
+    for area in map(Rect, areas):
+        x0 = max(0, -(-(area.left - offset_x) // cs))
+        x1 = min(cols - 1, (area.right - body.width - offset_x) // cs)
+        y0 = max(0, -(-(area.top - offset_y) // cs))
+        y1 = min(rows - 1, (area.bottom - body.height - offset_y) // cs)
+        if x0 <= x1:
+            for y in range(y0, y1 + 1):
+                flags[y * cols + x0:y * cols + x1 + 1] = b"\x01" * (x1 - x0 + 1)
+
+    # Each obstacle only rules out the cells within half a box of it, so only those are tested
+    for ob in map(Rect, obstacles):
+        for y in range(max(0, (ob.top - body.height) // cs), min(rows - 1, (ob.bottom + body.height) // cs) + 1):
+            for x in range(max(0, (ob.left - body.width) // cs), min(cols - 1, (ob.right + body.width) // cs) + 1):
+                if flags[y * cols + x]:
+                    body.center = (x * cs + cs // 2, y * cs + cs // 2)
+                    if body.colliderect(ob):
+                        flags[y * cols + x] = 0
+    return array("I", (i for i, free in enumerate(flags) if free))
+
+
+class FreeSpace:
+    #Where a box can be placed: its clear cells as one flat array, so a random free spot costs O(1)
+    def __init__(self, cells, cols, cell_size, size):
+        """cells: sorted cell numbers (cy * cols + cx) whose center a size (w, h) box
+        can sit on clear of the map's walls, from clear_cells() or a compiled map
+        (any buffer works). Moving things can block() more of them for a while."""
+        self.cells = cells
+        self.cols = cols
+        self.cell_size = cell_size
+        self.size = size
+        self.blocked = {}  # cell -> how many blocking objects cover it
+        self.blockers = {}  # object -> the cells it blocks
+
+    def __len__(self):
+        return len(self.cells)
+
+    def center(self, cell):
+        cs = self.cell_size
+        return (cell % self.cols) * cs + cs // 2, (cell // self.cols) * cs + cs // 2
+
+    def _covered(self, rect):
+        # Cells whose box would overlap rect
+        cs = self.cell_size
+        body = Rect(0, 0, *self.size)
+        x0, x1 = max(0, (rect.left - body.width) // cs), min(self.cols - 1, (rect.right + body.width) // cs)
+        found = []
+        for y in range(max(0, (rect.top - body.height) // cs), (rect.bottom + body.height) // cs + 1):
+            for x in range(x0, x1 + 1):
+                body.center = (x * cs + cs // 2, y * cs + cs // 2)
+                if body.colliderect(rect):
+                    found.append(y * self.cols + x)
+        return found
+
+    def block(self, obj, rect):
+        #Keep boxes from overlapping rect until unblock(obj); only the cells around rect are touched
+        self.unblock(obj)
+        cells = self.blockers[obj] = self._covered(rect)
+        for cell in cells:
+            self.blocked[cell] = self.blocked.get(cell, 0) + 1
+
+    def unblock(self, obj):
+        for cell in self.blockers.pop(obj, ()):
+            if self.blocked[cell] == 1:
+                del self.blocked[cell]
+            else:
+                self.blocked[cell] -= 1
+
+    def clear(self):
+        self.blocked.clear()
+        self.blockers.clear()
+
+    def is_free(self, cell):
+        #For a cell from self.cells: True unless something blocks it
+        return cell not in self.blocked
+
+    def cells_in(self, area):
+        #The clear cells whose center lies in area (a Rect), found by bisecting each row's run
+        cs, cols, cells = self.cell_size, self.cols, self.cells
+        x0, x1 = max(0, (area.left - cs // 2 + cs - 1) // cs), min(cols - 1, (area.right - 1 - cs // 2) // cs)
+        if x0 > x1:
+            return []
+        found = []
+        for y in range(max(0, (area.top - cs // 2 + cs - 1) // cs), (area.bottom - 1 - cs // 2) // cs + 1):
+            lo, hi = y * cols + x0, y * cols + x1
+            found.extend(cells[bisect_left(cells, lo):bisect_right(cells, hi)])
+        return found
+
+    def sample(self, rng, accept=None, area=None, tries=16):
+        """Center of a random free cell, or None when there is none. rng: a random.Random,
+        area: a Rect the center has to lie in, accept(x, y): False rules a spot out
+        (too close to a tank, outside the safe zone). A few random picks almost always
+        find one; only when they all fail (crowded map, small area) are the candidates listed."""
+        cells = self.cells
+        for _ in range(tries if len(cells) else 0):
+            cell = cells[rng.randrange(len(cells))]
+            if cell not in self.blocked:
+                x, y = self.center(cell)
+                if (area is None or area.collidepoint(x, y)) and (accept is None or accept(x, y)):
+                    return x, y
+        found = [c for c in (cells if area is None else self.cells_in(area))
+                 if c not in self.blocked and (accept is None or accept(*self.center(c)))]
+        return self.center(rng.choice(found)) if found else None
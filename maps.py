@@ -0,0 +1,193 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from pygame import Rect
+
+from free_space import clear_cells
+from navigation import NavGrid
+from spatial import PackedSpatialIndex
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10 and older have no TOML parser, JSON maps still load
+    tomllib = None
+
+# Map files (JSON, or TOML with the same keys):
+#   width, height: arena size in pixels
+#   obstacles: [x, y, w, h] walls
+#   spawns: [x, y] tank centers, at least the two players'; any more go to bots first
+#   safe_zone_center: [x, y], the middle of the arena if left out
+#   powerup_regions: [x, y, w, h] areas powerups spawn inside, all but a 50px border if left out
+#   name: shown instead of the file name, optional
+#
+# Compiled sidecar layout (native byte order, it is a local cache and never shipped):
+#   SIDECAR_MAGIC, then SIDECAR_HEADER, then in 4-byte aligned sections:
+#     obstacles: x, y, w, h int32 each, in map order (tiled to the world size)
+#     spatial index: index cols * rows + 1 uint32 offsets, then the uint32 obstacle
+#       indexes per cell (see PackedSpatialIndex)
+#     nav grid: one walkable byte per cell, padded to 4 bytes (see NavGrid)
+#     spawn cells: uint32 indexes of the walkable nav cells, where a tank fits centered
+#     powerup cells: uint32 indexes of the nav cells a powerup fits centered on inside a powerup region
+#       (see free_space.FreeSpace)
+SIDECAR_MAGIC = b"TANKMAP2"
+# obstacle count, index cell size, cols, rows, member count, nav cell size, cols, rows,
+# spawn cell count, powerup cell count
+SIDECAR_HEADER = struct.Struct("=10I")
+POWERUP_SIZE = 40
+
+
+class GameMap:
+    #A map as loaded from its file: arena size, walls, spawn points, safe zone and powerup regions
+    def __init__(self, name, width, height, obstacles, spawns, safe_zone_center, powerup_regions, digest):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.obstacles = obstacles  # Rects
+        self.spawns = spawns  # (x, y) tank centers
+        self.safe_zone_center = safe_zone_center
+        self.powerup_regions = powerup_regions  # Rects
+        self.digest = digest  # hash of the file's bytes; sidecars and replays check it
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            raw = file.read()
+        try:
+            if path.lower().endswith(".toml"):
+                if tomllib is None:
+                    raise ValueError("TOML maps need Python 3.11 or newer")
+                data = tomllib.loads(raw.decode("utf-8"))
+            else:
+                data = json.loads(raw)
+            width, height = int(data["width"]), int(data["height"])
+            obstacles = [Rect(r) for r in data.get("obstacles", [])]
+            spawns = [(int(x), int(y)) for x, y in data["spawns"]]
+            center = tuple(data.get("safe_zone_center", (width // 2, height // 2)))
+            regions = [Rect(r) for r in data.get("powerup_regions", [(50, 50, width - 100, height - 100)])]
+        except KeyError as e:
+            raise ValueError(f"{path} is not a valid map: it has no {e}") from e
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{path} is not a valid map: {e}") from e
+        if len(spawns) < 2:
+            raise ValueError(f"{path} is not a valid map: it needs spawn points for both players")
+        if not regions or any(r.width < POWERUP_SIZE or r.height < POWERUP_SIZE for r in regions):
+            raise ValueError(f"{path} is not a valid map: powerup regions must fit a powerup")
+        name = data.get("name") or os.path.splitext(os.path.basename(path))[0]
+        return cls(name, width, height, obstacles, spawns, center, regions, hashlib.sha1(raw).hexdigest()[:16])
+
+    def tiled(self, width, height):
+        """This map repeated across a width x height world, dropping walls and powerup
+        regions that would stick out of it. Players still start on the first tile,
+        and the safe zone closes in on the middle of the world."""
+        if (width, height) == (self.width, self.height):
+            return self
+        world = Rect(0, 0, width, height)
+        offsets = [(x, y) for y in range(0, height, self.height) for x in range(0, width, self.width)]
+
+        def repeat(rects):
+            # Tiles wholly inside the world keep what fits the map itself, only edge tiles test each rect
+            tile = Rect(0, 0, self.width, self.height)
+            fitting = [r for r in rects if tile.contains(r)]
+            return [r for x, y in offsets for r in
+                    ([f.move(x, y) for f in fitting] if x + self.width <= width and y + self.height <= height else
+                     [m for m in (r.move(x, y) for r in rects) if world.contains(m)])]
+
+        return GameMap(self.name, width, height, repeat(self.obstacles), self.spawns, world.center,
+                       repeat(self.powerup_regions) or [world], self.digest)
+
+
+class CompiledMap:
+    #A map's collision data worked out once and kept in a binary sidecar, memory-mapped by later runs
+    # sidecar key -> CompiledMap, so every match on a map in this process shares one
+    cache = {}
+
+    @classmethod
+    def for_map(cls, game_map, width, height, tank_size, nav_cell_size, index_cell_size, cache_dir=None):
+        """game_map tiled to width x height, compiled for tanks of tank_size: from memory,
+        from its sidecar in cache_dir, or compiled now (and written to cache_dir).
+        cache_dir None keeps it in memory."""
+        key = repr((game_map.digest, width, height, tuple(tank_size), nav_cell_size, index_cell_size,
+                    POWERUP_SIZE, sys.byteorder, SIDECAR_MAGIC))
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        compiled = cls.cache.get(key)
+        if compiled is not None:
+            return compiled
+        path = os.path.join(cache_dir, f"{key}.tankmap") if cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as file:
+                    compiled = cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+                compiled.loaded = True
+            except (OSError, ValueError):
+                compiled = None  # unreadable or cut short: compile it again
+        if compiled is None:
+            data = cls.compile(game_map.tiled(width, height), tank_size, nav_cell_size, index_cell_size)
+            if path:
+                cls._save(path, data)
+            compiled = cls(data)
+        cls.cache[key] = compiled
+        return compiled
+
+    @staticmethod
+    def compile(game_map, tank_size, nav_cell_size, index_cell_size):
+        #The sidecar bytes for game_map (already tiled to the world size)
+        cols = max(1, -(-game_map.width // index_cell_size))
+        rows = max(1, -(-game_map.height // index_cell_size))
+        starts, members = PackedSpatialIndex.pack(game_map.obstacles, index_cell_size, cols, rows)
+        walkable, nav_cols, nav_rows = NavGrid.rasterize(game_map.obstacles, game_map.width, game_map.height,
+                                                         tank_size, nav_cell_size)
+        spawn_cells = array("I", (i for i, w in enumerate(walkable) if w))
+        powerup_cells = clear_cells(game_map.obstacles, game_map.powerup_regions, game_map.width, game_map.height,
+                                    (POWERUP_SIZE, POWERUP_SIZE), nav_cell_size)
+        rects = array("i", (v for ob in game_map.obstacles for v in ob))
+        header = SIDECAR_HEADER.pack(len(game_map.obstacles), index_cell_size, cols, rows, len(members),
+                                     nav_cell_size, nav_cols, nav_rows, len(spawn_cells), len(powerup_cells))
+        return b"".join((SIDECAR_MAGIC, header, rects.tobytes(), starts.tobytes(), members.tobytes(),
+                         bytes(walkable), bytes(-len(walkable) % 4), spawn_cells.tobytes(),
+                         powerup_cells.tobytes()))
+
+    @staticmethod
+    def _save(path, data):
+        # Written to a temporary name first so a concurrent reader never sees half a file
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(data)
+        os.replace(tmp, path)
+
+    def __init__(self, buffer):
+        """buffer: sidecar bytes, or an mmap of the file. Nothing is copied out of it,
+        the sections are views the index and nav grid read straight from."""
+        view = memoryview(buffer)
+        if bytes(view[:len(SIDECAR_MAGIC)]) != SIDECAR_MAGIC:
+            raise ValueError("not a compiled map")
+        (count, self.index_cell_size, self.index_cols, self.index_rows, member_count, nav_cell_size,
+         nav_cols, nav_rows, spawn_count, powerup_count) = SIDECAR_HEADER.unpack_from(view, len(SIDECAR_MAGIC))
+        pos = len(SIDECAR_MAGIC) + SIDECAR_HEADER.size
+        sections = []
+        for size, fmt in ((4 * count, "i"), (self.index_cols * self.index_rows + 1, "I"), (member_count, "I"),
+                          (nav_cols * nav_rows, "B"), (spawn_count, "I"), (powerup_count, "I")):
+            nbytes = size * struct.calcsize(fmt)
+            if pos + nbytes > len(view):
+                raise ValueError("compiled map is cut short")
+            sections.append(view[pos:pos + nbytes].cast(fmt))
+            pos += nbytes + -nbytes % 4
+        self.rects, self.starts, self.members, walkable, self.spawn_cells, self.powerup_cells = sections
+        self.buffer = buffer  # keeps the mmap open as long as the views are in use
+        self.nav_grid = NavGrid(walkable, nav_cols, nav_rows, nav_cell_size)
+        self.loaded = False  # True when it came from a sidecar on disk
+
+    def obstacle_rects(self):
+        #(x, y, w, h) of every obstacle, in map order
+        rects = self.rects
+        return [tuple(rects[i:i + 4]) for i in range(0, len(rects), 4)]
+
+    def spatial_index(self, obstacles):
+        #Broadphase over obstacles, made from obstacle_rects() in the same order
+        return PackedSpatialIndex(obstacles, self.index_cell_size, self.index_cols, self.index_rows,
+                                  self.starts, self.members)
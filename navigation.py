@@ -0,0 +1,147 @@
+import heapq
+import math
+
+from pygame import Rect
+
+
+class NavGrid:
+    #Cells a tank's center can stand on, rasterized once per map and tank size (see maps.CompiledMap)
+    def __init__(self, walkable, cols, rows, cell_size):
+        """walkable: cols * rows flags row by row, nonzero where a tank's center can
+        stand; any buffer works, such as a memory-mapped map sidecar (see rasterize)"""
+        self.cell_size = cell_size
+        self.cols = cols
+        self.rows = rows
+        self.walkable = walkable
+        self._neighbours = {}
+        self._nearest = {}
+
+    @staticmethod
+    def rasterize(obstacles, width, height, tank_size, cell_size):
+        """(walkable, cols, rows) for obstacles: Rects, tank_size: (w, h) of a tank rect.
+        A cell is walkable when a tank centered on it stays inside the arena and
+        overlaps no obstacle, so obstacles are effectively inflated by half a tank on every side."""
+        cols = max(1, width // cell_size)
+        rows = max(1, height // cell_size)
+        cs = cell_size
+        body = Rect(0, 0, *tank_size)
+
+        # Inside the arena is a matter of column and row alone, so fill whole rows at once
+        inside_cols = bytearray(1 if 0 <= x * cs + cs // 2 - body.width // 2 and
+                                x * cs + cs // 2 - body.width // 2 + body.width <= width else 0
+                                for x in range(cols))
+        walkable = bytearray()
+        for y in range(rows):
+            top = y * cs + cs // 2 - body.height // 2
+            walkable += inside_cols if 0 <= top and top + body.height <= height else bytes(cols)
+
+        # Each obstacle only blocks the cells within half a tank of it, so only those are tested
+        for ob in map(Rect, obstacles):
+            x0 = max(0, (ob.left - body.width) // cs)
+            x1 = min(cols - 1, (ob.right + body.width) // cs)
+            y0 = max(0, (ob.top - body.height) // cs)
+            y1 = min(rows - 1, (ob.bottom + body.height) // cs)
+            for y in range(y0, y1 + 1):
+                for x in range(x0, x1 + 1):
+                    i = y * cols + x
+                    if walkable[i]:
+                        body.center = (x * cs + cs // 2, y * cs + cs // 2)
+                        if body.colliderect(ob):
+                            walkable[i] = 0
+        return walkable, cols, rows
+
+    def neighbours(self, i):
+        #(cell, step cost) of every cell a tank can step to from walkable cell i, worked out on first use
+        found = self._neighbours.get(i)
+        if found is None:
+            found = self._neighbours[i] = []
+            cx, cy = i % self.cols, i // self.cols
+            # Diagonal steps only where both orthogonal neighbours are free, so paths never cut corners
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)):
+                nx, ny = cx + dx, cy + dy
+                if not (0 <= nx < self.cols and 0 <= ny < self.rows) or not self.walkable[ny * self.cols + nx]:
+                    continue
+                if dx and dy and not (self.walkable[cy * self.cols + nx] and self.walkable[ny * self.cols + cx]):
+                    continue
+                found.append((ny * self.cols + nx, math.sqrt(2) if dx and dy else 1.0))
+        return found
+
+    def cell(self, pos):
+        #Index of the cell under an (x, y) point, clamped into the grid
+        x = min(max(int(pos[0]) // self.cell_size, 0), self.cols - 1)
+        y = min(max(int(pos[1]) // self.cell_size, 0), self.rows - 1)
+        return y * self.cols + x
+
+    def center(self, cell):
+        cs = self.cell_size
+        return (cell % self.cols) * cs + cs // 2, (cell // self.cols) * cs + cs // 2
+
+    def nearest_walkable(self, cell):
+        #The walkable cell closest to cell (itself if walkable), or None on a grid with none
+        if self.walkable[cell]:
+            return cell
+        if cell not in self._nearest:
+            # Rings of cells outwards; ring r holds nothing closer than r cells, so stop once
+            # that is further than the best so far. Ties go to the lowest index.
+            cx, cy = cell % self.cols, cell // self.cols
+            best = None
+            for r in range(1, max(self.cols, self.rows)):
+                if best is not None and r * r > best[0]:
+                    break
+                for y in range(max(0, cy - r), min(self.rows - 1, cy + r) + 1):
+                    edge = y in (cy - r, cy + r)
+                    for x in (range(max(0, cx - r), min(self.cols - 1, cx + r) + 1) if edge else (cx - r, cx + r)):
+                        i = y * self.cols + x
+                        if 0 <= x < self.cols and self.walkable[i]:
+                            key = ((x - cx) ** 2 + (y - cy) ** 2, i)
+                            if best is None or key < best:
+                                best = key
+            self._nearest[cell] = best[1] if best else None
+        return self._nearest[cell]
+
+    def find_path(self, start, goal, max_nodes=None):
+        """A* from start to goal cell over the 8-connected grid. Returns the cells
+        from start to goal inclusive, or [] when goal can't be reached.
+
+        max_nodes caps the cells expanded, which bounds the cost on big maps:
+        once reached, the path ends at the expanded cell estimated closest to goal."""
+        start, goal = self.nearest_walkable(start), self.nearest_walkable(goal)
+        if start is None or goal is None:
+            return []
+        cols = self.cols
+        gx, gy = goal % cols, goal // cols
+
+        def estimate(i):
+            # Octile distance, exact on an open grid
+            dx, dy = abs(i % cols - gx), abs(i // cols - gy)
+            return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+
+        def walk_back(current):
+            path = []
+            while current is not None:
+                path.append(current)
+                current = came_from[current]
+            return path[::-1]
+
+        cost = {start: 0.0}
+        came_from = {start: None}
+        frontier = [(estimate(start), start)]
+        closest = (estimate(start), start)
+        expanded = set()
+        while frontier:
+            _, current = heapq.heappop(frontier)
+            if current == goal:
+                return walk_back(current)
+            if max_nodes is not None and current not in expanded:
+                closest = min(closest, (estimate(current), current))
+                expanded.add(current)
+                if len(expanded) >= max_nodes:
+                    return walk_back(closest[1])
+            base = cost[current]
+            for nxt, step in self.neighbours(current):
+                new_cost = base + step
+                if new_cost < cost.get(nxt, math.inf):
+                    cost[nxt] = new_cost
+                    came_from[nxt] = current
+                    heapq.heappush(frontier, (new_cost + estimate(nxt), nxt))
+        return []
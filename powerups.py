@@ -4,6 +4,7 @@ import random
 
 class Powerup: 
     #Base class for all power-ups
+    effect = None  # name of the timed effect (effects.EFFECTS) picking it up puts on the tank for effect_duration
     def __init__(self, pos, effect_duration=300):
         """pos: (x, y) position for the powerup to spawn
         effect_duration: how long the effect lasts (frames or milliseconds)"""
@@ -19,51 +20,47 @@ class Powerup:
         #place holder for subclasses' image to animate
         pass
 
-    def draw(self, surf):
+    def draw(self, surf, offset=(0, 0)):
         #placeholder for subclasses to draw the power-up
-        pygame.draw.rect(surf, (200, 200, 50), self.rect)
+        #offset: added to the world position to get the screen position (Camera.offset)
+        return pygame.draw.rect(surf, (200, 200, 50), self.rect.move(offset))
 
 class HeartPowerup(Powerup):
     #This powerup gives the player an extra life/added HP
 
-    def draw(self, surf):
-        pygame.draw.rect(surf, (255, 50, 50), self.rect)  # Red box for heart
+    def draw(self, surf, offset=(0, 0)):
+        return pygame.draw.rect(surf, (255, 50, 50), self.rect.move(offset))  # Red box for heart
 
     def apply(self, tank):
         tank.hp += 1  # Add extra life
 
 class HomingBulletPowerup(Powerup):
     #This powerup will allow a player's bullets to follow (hom) the other player for a limited time
+    effect = "homing_bullet"
 
-    def draw(self, surf):
-        pygame.draw.rect(surf, (100, 255, 255), self.rect)  # Cyan
-
-    def apply(self, tank):
-        tank.homing_bullet_timer = self.effect_duration
-        # You should handle in your Tank code: if homing_bullet_timer > 0, new bullets follow enemy
+    def draw(self, surf, offset=(0, 0)):
+        return pygame.draw.rect(surf, (100, 255, 255), self.rect.move(offset))  # Cyan
 
 class DoubleShotPowerup(Powerup):
     #This powerup enables double bullets for the player temporarily
+    effect = "double_shot"
 
-    def draw(self, surf):
-        pygame.draw.rect(surf, (0, 255, 100), self.rect)  # Green
-
-    def apply(self, tank):
-        tank.double_shot_timer = self.effect_duration
-        # In your Tank _shoot() method, check if double_shot_timer > 0 and shoot two bullets
+    def draw(self, surf, offset=(0, 0)):
+        return pygame.draw.rect(surf, (0, 255, 100), self.rect.move(offset))  # Green
 
 class ShieldPowerup(Powerup):
     #This powerup makes the player invincible for a while with the bubble shield
+    effect = "shield"
 
-    def draw(self, surf):
-        pygame.draw.rect(surf, (150, 150, 255), self.rect)  # Light blue
+    def draw(self, surf, offset=(0, 0)):
+        return pygame.draw.rect(surf, (150, 150, 255), self.rect.move(offset))  # Light blue
 
-    def apply(self, tank):
-        tank.shield_timer = self.effect_duration
-        # In your Tank code, if shield_timer > 0, ignore incoming damage
+
+#Every powerup kind; the index is also the kind id in saved game states
+POWERUP_CLASSES = [HeartPowerup, HomingBulletPowerup, DoubleShotPowerup, ShieldPowerup]
 
 
-def random_powerup(pos):
+def random_powerup(pos, rng=random):
     #Spawns a random one of the powerups at a random time
-    powerup_classes = [HeartPowerup, HomingBulletPowerup, DoubleShotPowerup, ShieldPowerup]
-    return random.choice(powerup_classes)(pos)
\ No newline at end of file
+    #rng: the match's random.Random so spawns are reproducible from its seed
+    return rng.choice(POWERUP_CLASSES)(pos)
\ No newline at end of file
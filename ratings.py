@@ -0,0 +1,185 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, recompute() falls back to replaying matches one by one
+    np = None
+
+ELO_START = 1500.0
+ELO_K = 32.0
+# Glicko-2: (rating, rating deviation, volatility) of a new player, and the system constant tau
+GLICKO_START = (1500.0, 350.0, 0.06)
+GLICKO_TAU = 0.5
+GLICKO_SCALE = 173.7178
+GLICKO_EPSILON = 1e-6
+
+
+def elo_update(rating_a, rating_b, score_a, k=ELO_K):
+    #New (a, b) Elo ratings after one match; score_a is 1 for a win, 0.5 for a draw, 0 for a loss
+    expected_a = 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+    change = k * (score_a - expected_a)
+    return rating_a + change, rating_b - change
+
+
+def _glicko2_player(player, opponent, score, tau):
+    # One Glicko-2 rating period holding a single game, from player's side
+    mu, phi = (player[0] - 1500) / GLICKO_SCALE, player[1] / GLICKO_SCALE
+    mu_j, phi_j = (opponent[0] - 1500) / GLICKO_SCALE, opponent[1] / GLICKO_SCALE
+    sigma = player[2]
+    g = 1 / math.sqrt(1 + 3 * phi_j * phi_j / math.pi ** 2)
+    expected = 1 / (1 + math.exp(-g * (mu - mu_j)))
+    v = 1 / (g * g * expected * (1 - expected))
+    delta = v * g * (score - expected)
+
+    # New volatility: root of f by the Illinois method, as in Glickman's paper
+    a = math.log(sigma * sigma)
+
+    def f(x):
+        ex = math.exp(x)
+        return ex * (delta * delta - phi * phi - v - ex) / (2 * (phi * phi + v + ex) ** 2) - (x - a) / (tau * tau)
+
+    lo = a
+    if delta * delta > phi * phi + v:
+        hi = math.log(delta * delta - phi * phi - v)
+    else:
+        k = 1
+        while f(a - k * tau) < 0:
+            k += 1
+        hi = a - k * tau
+    f_lo, f_hi = f(lo), f(hi)
+    while abs(hi - lo) > GLICKO_EPSILON:
+        mid = lo + (lo - hi) * f_lo / (f_hi - f_lo)
+        f_mid = f(mid)
+        if f_mid * f_hi <= 0:
+            lo, f_lo = hi, f_hi
+        else:
+            f_lo /= 2
+        hi, f_hi = mid, f_mid
+    new_sigma = math.exp(lo / 2)
+
+    phi_star = math.sqrt(phi * phi + new_sigma * new_sigma)
+    new_phi = 1 / math.sqrt(1 / (phi_star * phi_star) + 1 / v)
+    new_mu = mu + new_phi * new_phi * g * (score - expected)
+    return new_mu * GLICKO_SCALE + 1500, new_phi * GLICKO_SCALE, new_sigma
+
+
+def glicko2_update(player_a, player_b, score_a, tau=GLICKO_TAU):
+    """New (a, b) Glicko-2 states after one match, treating it as its own rating
+    period. A state is (rating, rating deviation, volatility)."""
+    return (_glicko2_player(player_a, player_b, score_a, tau),
+            _glicko2_player(player_b, player_a, 1 - score_a, tau))
+
+
+def _glicko2_batch(r, rd, sigma, r_j, rd_j, score, tau):
+    # _glicko2_player() for arrays of independent games
+    mu, phi = (r - 1500) / GLICKO_SCALE, rd / GLICKO_SCALE
+    mu_j, phi_j = (r_j - 1500) / GLICKO_SCALE, rd_j / GLICKO_SCALE
+    g = 1 / np.sqrt(1 + 3 * phi_j * phi_j / math.pi ** 2)
+    expected = 1 / (1 + np.exp(-g * (mu - mu_j)))
+    v = 1 / (g * g * expected * (1 - expected))
+    delta = v * g * (score - expected)
+    a = np.log(sigma * sigma)
+    base = phi * phi + v
+
+    def f(x):
+        ex = np.exp(x)
+        return ex * (delta * delta - base - ex) / (2 * (base + ex) ** 2) - (x - a) / (tau * tau)
+
+    lo = a.copy()
+    big = delta * delta > base
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hi = np.where(big, np.log(np.where(big, delta * delta - base, 1.0)), 0.0)
+    k = np.ones_like(a)
+    search = ~big
+    while search.any():
+        search &= f(a - k * tau) < 0
+        k += search
+    hi = np.where(big, hi, a - k * tau)
+    f_lo, f_hi = f(lo), f(hi)
+    active = np.abs(hi - lo) > GLICKO_EPSILON
+    while active.any():
+        mid = lo + (lo - hi) * f_lo / (f_hi - f_lo)
+        f_mid = f(mid)
+        flip = active & (f_mid * f_hi <= 0)
+        keep = active & ~flip
+        lo = np.where(flip, hi, lo)
+        f_lo = np.where(flip, f_hi, np.where(keep, f_lo / 2, f_lo))
+        hi = np.where(active, mid, hi)
+        f_hi = np.where(active, f_mid, f_hi)
+        active &= np.abs(hi - lo) > GLICKO_EPSILON
+    new_sigma = np.exp(lo / 2)
+
+    phi_star = np.sqrt(phi * phi + new_sigma * new_sigma)
+    new_phi = 1 / np.sqrt(1 / (phi_star * phi_star) + 1 / v)
+    new_mu = mu + new_phi * new_phi * g * (score - expected)
+    return new_mu * GLICKO_SCALE + 1500, new_phi * GLICKO_SCALE, new_sigma
+
+
+def _waves(first, second, players):
+    """Wave number of every match: one more than the latest wave either player was
+    in before it. A player appears at most once per wave, and every match comes
+    after all earlier matches of both of its players, so applying the waves in
+    order with whole-array updates gives the same ratings as match-by-match."""
+    last = [0] * players
+    waves = [0] * len(first)
+    for i, (a, b) in enumerate(zip(first, second)):
+        w = last[a] if last[a] > last[b] else last[b]
+        waves[i] = w
+        last[a] = last[b] = w + 1
+    return waves
+
+
+def recompute(matches, k=ELO_K, tau=GLICKO_TAU, min_wave=16):
+    """Ratings of every player from a full match history, oldest first.
+
+    matches: (player1, player2, score of player1) with 1 / 0.5 / 0.
+    Returns {name: (elo, glicko rating, rating deviation, volatility, games)},
+    the same as applying elo_update() and glicko2_update() match by match.
+    With numpy, matches are processed in waves of independent games as whole
+    arrays; when waves average under min_wave games (a few players with very
+    long histories) a plain loop is faster and is used instead."""
+    matches = list(matches)
+    index = {}
+    first = [index.setdefault(p1, len(index)) for p1, _, _ in matches]
+    second = [index.setdefault(p2, len(index)) for _, p2, _ in matches]
+    names = list(index)
+    if not matches:
+        return {}
+    waves = _waves(first, second, len(names))
+    wave_count = max(waves) + 1
+
+    if np is None or len(matches) / wave_count < min_wave:
+        elo = [ELO_START] * len(names)
+        glicko = [GLICKO_START] * len(names)
+        games = [0] * len(names)
+        for a, b, (_, _, score) in zip(first, second, matches):
+            elo[a], elo[b] = elo_update(elo[a], elo[b], score, k)
+            glicko[a], glicko[b] = glicko2_update(glicko[a], glicko[b], score, tau)
+            games[a] += 1
+            games[b] += 1
+        return {name: (elo[i], *glicko[i], games[i]) for i, name in enumerate(names)}
+
+    first = np.array(first, dtype=np.int64)
+    second = np.array(second, dtype=np.int64)
+    score = np.array([s for _, _, s in matches], dtype=np.float64)
+    waves = np.array(waves, dtype=np.int64)
+    order = np.argsort(waves, kind="stable")
+    bounds = np.searchsorted(waves[order], np.arange(wave_count + 1))
+
+    elo = np.full(len(names), ELO_START)
+    r = np.full(len(names), GLICKO_START[0])
+    rd = np.full(len(names), GLICKO_START[1])
+    sigma = np.full(len(names), GLICKO_START[2])
+    for w in range(wave_count):
+        idx = order[bounds[w]:bounds[w + 1]]
+        a, b, s = first[idx], second[idx], score[idx]
+        expected = 1 / (1 + 10 ** ((elo[b] - elo[a]) / 400))
+        change = k * (s - expected)
+        elo[a], elo[b] = elo[a] + change, elo[b] - change
+        new_a = _glicko2_batch(r[a], rd[a], sigma[a], r[b], rd[b], s, tau)
+        new_b = _glicko2_batch(r[b], rd[b], sigma[b], r[a], rd[a], 1 - s, tau)
+        r[a], rd[a], sigma[a] = new_a
+        r[b], rd[b], sigma[b] = new_b
+    games = np.bincount(first, minlength=len(names)) + np.bincount(second, minlength=len(names))
+    return {name: (float(elo[i]), float(r[i]), float(rd[i]), float(sigma[i]), int(games[i]))
+            for i, name in enumerate(names)}
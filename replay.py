@@ -0,0 +1,185 @@
+import json
+import queue
+import struct
+import threading
+from collections import defaultdict
+
+# File layout:
+#   MAGIC, then a little-endian uint32 header length and a UTF-8 JSON header
+#   (seed, difficulty, cheats, player names, Settings snapshot, tank count, map file hash,
+#   Game.STATE_VERSION of the keyframes),
+#   then chunks of CHUNK = (tag, first frame, payload length) + payload:
+#     b"I": one byte per tank per logic tick holding that tank's control bitmask
+#     b"S": a Game.save_state() keyframe taken before that frame's input
+# Version 1 files have no chunks, just the masks after the header.
+MAGIC = b"TANKRPL2"
+MAGIC_V1 = b"TANKRPL1"
+CHUNK = struct.Struct("<cII")
+CONTROLS = ("up", "down", "left", "right", "shoot")  # bit 0..4 of a tank's mask
+CHEAT_FLAGS = ("cheat_tank_name", "cheat_wall", "bullet_hack", "bullet_through_wall")
+
+
+def settings_snapshot(settings):
+    #Plain-data copy of every UPPERCASE setting, enough to rebuild the same match
+    return {name: value for name, value in vars(settings).items()
+            if name.isupper() and isinstance(value, (int, float, str, tuple, type(None)))}
+
+
+class ReplayController:
+    #Drives one tank from a replay's recorded masks, whoever controlled it originally
+    def __init__(self, replay, index):
+        self.replay = replay
+        self.index = index
+
+    def controls(self, keys, tank, game):
+        return self.replay.frames[game.frame * self.replay.header["tanks"] + self.index]
+
+
+class ReplayRecorder:
+    #Buffers per-tick inputs in memory and writes them out on a background thread
+    def __init__(self, path, game, settings, flush_size=4096, snapshot_interval=600):
+        """path: file to write, game: the Game about to be played (after restart()),
+        settings: the Settings class, flush_size: bytes buffered before a write,
+        snapshot_interval: ticks between keyframes (0 disables them)"""
+        self.path = path
+        self.game = game
+        self.flush_size = flush_size
+        self.snapshot_interval = snapshot_interval
+        self.buffer = bytearray()
+        self.buffer_start = 0  # frame of the first mask in buffer
+        self.frames = 0
+        self._queue = queue.Queue()
+        self._file = open(path, "wb")
+        header = {
+            "seed": game.seed,
+            "difficulty": game.difficulty,
+            "cheats": {flag: getattr(game, flag) for flag in CHEAT_FLAGS},
+            "player_names": list(game.player_names),
+            "tanks": len(game.tanks),
+            "map": game.game_map.digest,
+            "state": game.STATE_VERSION,
+            "settings": settings_snapshot(settings),
+        }
+        data = json.dumps(header).encode("utf-8")
+        self._file.write(MAGIC + struct.pack("<I", len(data)) + data)
+        self._thread = threading.Thread(target=self._writer, name="replay-writer", daemon=True)
+        self._thread.start()
+
+    def _writer(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            self._file.write(chunk)
+        self._file.close()
+
+    def record(self, masks):
+        #Called once per logic tick with the control bitmask of every tank, before they move
+        if self.snapshot_interval and self.frames % self.snapshot_interval == 0:
+            self.flush()
+            state = self.game.save_state()
+            self._queue.put(CHUNK.pack(b"S", self.frames, len(state)) + state)
+        self.buffer += masks
+        self.frames += 1
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self._queue.put(CHUNK.pack(b"I", self.buffer_start, len(self.buffer)) + bytes(self.buffer))
+            self.buffer = bytearray()
+        self.buffer_start = self.frames
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Replay:
+    #A loaded replay: the header, the raw per-tick masks and any keyframes
+    def __init__(self, header, frames, snapshots=None):
+        self.header = header
+        self.frames = frames  # bytes, header["tanks"] masks per tick
+        self.snapshots = snapshots or {}  # frame -> Game.save_state() bytes
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            magic = file.read(len(MAGIC))
+            if magic not in (MAGIC, MAGIC_V1):
+                raise ValueError(f"{path} is not a tank replay")
+            (length,) = struct.unpack("<I", file.read(4))
+            header = json.loads(file.read(length).decode("utf-8"))
+            body = file.read()
+        tanks = header["tanks"]
+        if magic == MAGIC_V1:
+            # A crash mid-write can leave a partial tick at the end; drop it
+            return cls(header, body[:len(body) - len(body) % tanks])
+
+        frames = bytearray()
+        snapshots = {}
+        pos = 0
+        while pos + CHUNK.size <= len(body):
+            tag, frame, size = CHUNK.unpack_from(body, pos)
+            payload = body[pos + CHUNK.size:pos + CHUNK.size + size]
+            if len(payload) < size:
+                break  # chunk cut short by a crash mid-write
+            if tag == b"I":
+                frames += payload
+            elif tag == b"S":
+                snapshots[frame] = payload
+            pos += CHUNK.size + size
+        return cls(header, bytes(frames), snapshots)
+
+    def __len__(self):
+        return len(self.frames) // self.header["tanks"]
+
+    def masks(self, frame):
+        n = self.header["tanks"]
+        return self.frames[frame * n:(frame + 1) * n]
+
+    def setup(self, game, settings):
+        #Put settings and game back into the recorded match's starting state
+        for name, value in self.header["settings"].items():
+            setattr(settings, name, tuple(value) if isinstance(value, list) else value)
+        game.difficulty = self.header["difficulty"]
+        for flag, value in self.header["cheats"].items():
+            setattr(game, flag, value)
+        # Replays from before multi-tank matches were all two-tank free-for-alls, those from
+        # before scrolling maps were played on a window-sized world, and those from before
+        # free-space spawning placed powerups by trial and error
+        recorded = self.header["settings"]
+        settings.TANK_COUNT = self.header["tanks"]
+        settings.TEAM_COUNT = recorded.get("TEAM_COUNT", 0)
+        settings.WORLD_WIDTH = recorded.get("WORLD_WIDTH", recorded.get("WIDTH", settings.WIDTH))
+        settings.WORLD_HEIGHT = recorded.get("WORLD_HEIGHT", recorded.get("HEIGHT", settings.HEIGHT))
+        settings.FREE_SPACE_SPAWNS = recorded.get("FREE_SPACE_SPAWNS", False)
+        game.player_names = list(self.header["player_names"])
+        self.restart(game)
+        if self.header.get("map", game.game_map.digest) != game.game_map.digest:
+            raise ValueError(f"the map {game.game_map.name} was edited since this replay was recorded")
+        if self.header.get("state") != game.STATE_VERSION:
+            # Keyframes saved in an older layout can't be restored; seek() simulates from the start instead
+            self.snapshots = {}
+
+    def restart(self, game):
+        # The recorded masks already hold what players and AIs decided, so every tank just replays them
+        game.restart(seed=self.header["seed"])
+        for i, tank in enumerate(game.tanks):
+            tank.controller = ReplayController(self, i)
+
+    def seek(self, game, frame):
+        """Bring an already set up game to the state before tick `frame` by
+        restoring the nearest earlier keyframe and simulating forward from it."""
+        frame = min(frame, len(self))
+        start = max((f for f in self.snapshots if f <= frame), default=0)
+        # Simulating on from where the game already is beats restoring an older keyframe
+        if game.frame > frame or start > game.frame:
+            if start in self.snapshots:
+                game.load_state(self.snapshots[start])
+            else:
+                self.restart(game)
+        idle_keys = defaultdict(bool)
+        while game.frame < frame and not (game.winner or game.is_draw):
+            game.step(idle_keys)
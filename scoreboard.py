@@ -0,0 +1,339 @@
+import csv
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+
+import ratings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    rank_points INTEGER NOT NULL DEFAULT 0,
+    net_score INTEGER NOT NULL DEFAULT 0
+);
+DROP INDEX IF EXISTS players_by_rank;
+CREATE INDEX IF NOT EXISTS players_ranking ON players (rank_points DESC, net_score DESC, name);
+CREATE INDEX IF NOT EXISTS players_by_name ON players (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    players INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    player1 TEXT NOT NULL,
+    player2 TEXT NOT NULL,
+    winner TEXT,
+    remaining_hp INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ratings (
+    name TEXT PRIMARY KEY,
+    elo REAL NOT NULL,
+    glicko REAL NOT NULL,
+    glicko_rd REAL NOT NULL,
+    glicko_volatility REAL NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ratings_by_elo ON ratings (elo DESC, name);
+CREATE INDEX IF NOT EXISTS ratings_by_glicko ON ratings (glicko DESC, name);
+"""
+
+# Adds to a player's totals, creating the row on their first match
+UPSERT = """
+INSERT INTO players (name, rank_points, net_score) VALUES (?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET rank_points = rank_points + excluded.rank_points,
+                                 net_score = net_score + excluded.net_score
+"""
+
+SET_RATING = """
+INSERT OR REPLACE INTO ratings (name, elo, glicko, glicko_rd, glicko_volatility, games) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# What show_ranking() can order players by: table, the value shown, the tie-breaker
+# column (None for none besides the name) and the label
+RANKINGS = {
+    "points": ("players", "rank_points", "net_score", "Rank Points"),
+    "elo": ("ratings", "elo", None, "Elo"),
+    "glicko": ("ratings", "glicko", None, "Glicko-2"),
+}
+
+
+def score_changes(results):
+    """(name, rank points, net score) to add for each player of each result.
+
+    results: (player1, player2, winner name or None for a draw, winner's remaining hp)"""
+    for player1_name, player2_name, winner_name, remaining_hp in results:
+        if winner_name is None:
+            yield player1_name, 5, 0
+            yield player2_name, 5, 0
+        else:
+            loser = player2_name if winner_name == player1_name else player1_name
+            yield winner_name, 10, remaining_hp
+            yield loser, 0, 0
+
+
+def match_score(player1_name, winner_name):
+    #player1's score for the rating engines: 1 for a win, 0.5 for a draw, 0 for a loss
+    if winner_name is None:
+        return 0.5
+    return 1.0 if winner_name == player1_name else 0.0
+
+
+class Scoreboard:
+    #Player scores in SQLite: one transaction per batch of results, ranked through an index
+    def __init__(self, path, timeout=10.0):
+        """path: database file, created on first use. timeout: seconds to wait
+        for another process's write to finish before giving up."""
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            # Boards from before ratings existed: give their players the starting ratings
+            if not self.conn.execute("SELECT 1 FROM ratings LIMIT 1").fetchone():
+                self.conn.execute("INSERT INTO ratings (name, elo, glicko, glicko_rd, glicko_volatility) "
+                                  "SELECT name, ?, ?, ?, ? FROM players", (ratings.ELO_START, *ratings.GLICKO_START))
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, results):
+        """Apply match results atomically: either every player's totals, ratings
+        and match history change or none do. Draws count for the ratings too."""
+        results = list(results)
+        with self.conn:
+            self.conn.executemany(UPSERT, score_changes(results))
+            for player1_name, player2_name, winner_name, remaining_hp in results:
+                self.conn.execute("INSERT INTO matches (player1, player2, winner, remaining_hp) VALUES (?, ?, ?, ?)",
+                                  (player1_name, player2_name, winner_name, remaining_hp))
+                score = match_score(player1_name, winner_name)
+                (elo1, *glicko1, games1), (elo2, *glicko2, games2) = self._rating(player1_name), self._rating(player2_name)
+                elo1, elo2 = ratings.elo_update(elo1, elo2, score)
+                glicko1, glicko2 = ratings.glicko2_update(glicko1, glicko2, score)
+                self.conn.execute(SET_RATING, (player1_name, elo1, *glicko1, games1 + 1))
+                self.conn.execute(SET_RATING, (player2_name, elo2, *glicko2, games2 + 1))
+
+    def _rating(self, name):
+        # Starting values for a player without a rating yet
+        return self.rating(name) or (ratings.ELO_START, *ratings.GLICKO_START, 0)
+
+    def rating(self, name):
+        #(elo, glicko rating, glicko rd, glicko volatility, games) of one player, or None if they never played
+        return self.conn.execute("SELECT elo, glicko, glicko_rd, glicko_volatility, games FROM ratings WHERE name = ?",
+                                 (name,)).fetchone()
+
+    def recompute_ratings(self):
+        """Rebuild every rating from the match history in one batch, e.g. after
+        changing ELO_K or GLICKO_TAU. Players with no recorded matches (imported
+        totals) go back to the starting ratings. Returns the number of matches."""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            history = self.conn.execute("SELECT player1, player2, winner FROM matches ORDER BY id").fetchall()
+            new = ratings.recompute((p1, p2, match_score(p1, winner)) for p1, p2, winner in history)
+            self.conn.execute("UPDATE ratings SET elo = ?, glicko = ?, glicko_rd = ?, glicko_volatility = ?, games = 0",
+                              (ratings.ELO_START, *ratings.GLICKO_START))
+            self.conn.executemany(SET_RATING, ((name, *values) for name, values in new.items()))
+        return len(history)
+
+    def top(self, k, offset=0, by="points"):
+        """[(name, value, tie-breaker)] of the best k players after skipping offset,
+        by one of RANKINGS: (name, rank points, net score) for "points",
+        (name, rating, games) for "elo" and (name, rating, rd) for "glicko"."""
+        if by == "points":
+            return self.conn.execute(
+                "SELECT name, rank_points, net_score FROM players "
+                "ORDER BY rank_points DESC, net_score DESC, name LIMIT ? OFFSET ?", (k, offset)).fetchall()
+        extra = "games" if by == "elo" else "glicko_rd"
+        return self.conn.execute(f"SELECT name, {by}, {extra} FROM ratings ORDER BY {by} DESC, name LIMIT ? OFFSET ?",
+                                 (k, offset)).fetchall()
+
+    def count(self, by="points"):
+        #How many players top(..., by) can page through
+        return self.conn.execute(f"SELECT COUNT(*) FROM {RANKINGS[by][0]}").fetchone()[0]
+
+    def rank(self, name, by="points"):
+        #0-based position of a player in top(..., by) order, or None if they aren't ranked there
+        if by == "points":
+            row = self.get(name)
+            if row is None:
+                return None
+            points, net = row
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM players WHERE rank_points > ? OR (rank_points = ? AND "
+                "(net_score > ? OR (net_score = ? AND name < ?)))", (points, points, net, net, name)).fetchone()[0]
+        row = self.conn.execute(f"SELECT {by} FROM ratings WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return self.conn.execute(f"SELECT COUNT(*) FROM ratings WHERE {by} > ? OR ({by} = ? AND name < ?)",
+                                 (row[0], row[0], name)).fetchone()[0]
+
+    @staticmethod
+    def _prefix_range(prefix):
+        # NOCASE compares names ASCII-lowercased, so every name with the prefix sorts from the
+        # lowercased prefix up to it with its last character bumped to the next one in that order
+        prefix = prefix.lower()
+        bumped = chr(ord(prefix[-1]) + 1)
+        if "A" <= bumped <= "Z":
+            bumped = "["  # after "@" come the uppercase letters, which NOCASE sorts as lowercase ones
+        return prefix, prefix[:-1] + bumped
+
+    def count_prefix(self, prefix):
+        #How many players search(prefix, ...) can page through
+        if not prefix:
+            return 0
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM players WHERE name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE",
+            self._prefix_range(prefix)).fetchone()[0]
+
+    def search(self, prefix, k, offset=0):
+        """[(name, rank points, net score)] of up to k players whose name starts with
+        prefix, ignoring ASCII case, in name order. A range scan of the name index."""
+        if not prefix:
+            return []
+        return self.conn.execute(
+            "SELECT name, rank_points, net_score FROM players "
+            "WHERE name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE "
+            "ORDER BY name COLLATE NOCASE LIMIT ? OFFSET ?", (*self._prefix_range(prefix), k, offset)).fetchall()
+
+    def get(self, name):
+        #(rank points, net score) of one player, or None if they never played
+        return self.conn.execute("SELECT rank_points, net_score FROM players WHERE name = ?", (name,)).fetchone()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+
+    def import_csv(self, filename):
+        """Add the totals of a beta5/beta6 player_scores CSV (Player, Rank Points,
+        Net Score) to the board. Each file is imported once; later calls for the
+        same path return 0. Returns the number of players imported."""
+        source = os.path.abspath(filename)
+        if not os.path.isfile(filename):
+            return 0
+        rows = []
+        with open(filename, mode="r", newline="") as file:
+            for row in csv.DictReader(file):
+                try:
+                    rows.append((row["Player"], int(row["Rank Points"]), int(row["Net Score"])))
+                except (KeyError, TypeError, ValueError):
+                    continue  # skip damaged rows rather than the whole file
+        with self.conn:
+            # Take the write lock before checking, so two processes can't both import the file
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+                return 0
+            self.conn.executemany(UPSERT, rows)
+            # Imported players have no match history, so they start from the initial ratings
+            self.conn.executemany("INSERT OR IGNORE INTO ratings (name, elo, glicko, glicko_rd, glicko_volatility) "
+                                  "VALUES (?, ?, ?, ?, ?)",
+                                  ((row[0], ratings.ELO_START, *ratings.GLICKO_START) for row in rows))
+            self.conn.execute("INSERT INTO imports (source, players) VALUES (?, ?)", (source, len(rows)))
+        return len(rows)
+
+
+class ScoreWriter:
+    #Saves match results on a background thread, so a slow disk never stalls a frame
+    def __init__(self, path, max_pending=256, retry_delay=1.0):
+        """path: the Scoreboard database, max_pending: matches queued before
+        submit() has to wait for the writer to catch up, retry_delay: seconds
+        between attempts while the database can't be opened or written.
+        Results still unsaved at close() are kept in path + ".pending", one
+        JSON list per line, and written by the next ScoreWriter on path."""
+        self.path = path
+        self.pending_path = path + ".pending"
+        self.retry_delay = retry_delay
+        self.failed = self._load_pending()  # results not written yet, retried with the next batch
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._writer, name="score-writer", daemon=True)
+        self._thread.start()
+
+    def _load_pending(self):
+        try:
+            with open(self.pending_path, encoding="utf-8") as file:
+                return [tuple(json.loads(line)) for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            print(f"Could not read unsaved match results from {self.pending_path}: {e}", file=sys.stderr)
+            return []
+
+    def _writer(self):
+        # SQLite connections belong to the thread that opened them. Opening is retried like a
+        # failed write, and every queue item is marked done, so flush() never waits forever.
+        board = None
+        stop = False
+        try:
+            while not stop:
+                try:
+                    batch = [self._queue.get(timeout=self.retry_delay if self.failed else None)]
+                except queue.Empty:
+                    batch = []  # nothing new, just retry what failed
+                try:
+                    # Everything that queued up meanwhile goes into the same transaction
+                    while True:
+                        try:
+                            batch.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    stop = None in batch
+                    results = self.failed + [r for match in batch if match is not None for r in match]
+                    if results:
+                        try:
+                            if board is None:
+                                board = Scoreboard(self.path)
+                            board.record(results)
+                            self.failed = []
+                            if os.path.exists(self.pending_path):
+                                os.remove(self.pending_path)
+                        except (sqlite3.Error, OSError) as e:
+                            self.failed = results
+                            print(f"Could not save {len(results)} match results: {e}", file=sys.stderr)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            if board is not None:
+                board.close()
+
+    def _put(self, item):
+        # Queue item unless the writer thread is gone; False if it is
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def submit(self, results):
+        #Queue one match's (player1, player2, winner or None, remaining hp) results, written together
+        results = list(results)
+        if not self._put(results):
+            self.failed += results  # kept for the pending file by close()
+
+    def flush(self):
+        #Wait until everything submitted so far is written (or has failed), or the writer is gone
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._thread.is_alive():
+                self._queue.all_tasks_done.wait(0.1)
+
+    def close(self):
+        """Stop the writer after one last attempt at what is queued. Whatever is
+        still unsaved goes to the pending file for the next run."""
+        self._put(None)
+        self._thread.join()
+        while True:
+            try:
+                match = self._queue.get_nowait()  # left behind by a writer that died
+            except queue.Empty:
+                break
+            if match is not None:
+                self.failed += match
+        if not self.failed:
+            return
+        try:
+            with open(self.pending_path, "w", encoding="utf-8") as file:
+                file.writelines(json.dumps(list(result)) + "\n" for result in self.failed)
+            print(f"Kept {len(self.failed)} unsaved match results in {self.pending_path}", file=sys.stderr)
+        except OSError as e:
+            print(f"Lost {len(self.failed)} unsaved match results ({e}): {self.failed}", file=sys.stderr)
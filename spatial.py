@@ -0,0 +1,210 @@
+import math
+from array import array
+
+from pygame import Rect
+
+
+class SpatialHash:
+    #Uniform grid broadphase: objects with a .rect are bucketed into every cell their rect overlaps
+    def __init__(self, cell_size=100):
+        """cell_size: width/height of one grid cell in pixels. Roughly the size of
+        the biggest moving object works well (a tank is 60x75 by default)."""
+        self.cell_size = cell_size
+        self.cells = {}  # (cx, cy) -> {obj: None}, dicts keep insertion order
+        self.object_cells = {}  # obj -> tuple of cells it is in
+
+    def _cells_for(self, rect):
+        cs = self.cell_size
+        # right/bottom are exclusive in pygame, so a 100px rect at x=0 stays in one cell
+        x0, x1 = rect.left // cs, (rect.right - 1) // cs
+        y0, y1 = rect.top // cs, (rect.bottom - 1) // cs
+        return tuple((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1))
+
+    def insert(self, obj, rect=None):
+        rect = obj.rect if rect is None else rect
+        cells = self._cells_for(rect)
+        for cell in cells:
+            self.cells.setdefault(cell, {})[obj] = None
+        self.object_cells[obj] = cells
+
+    def remove(self, obj):
+        for cell in self.object_cells.pop(obj, ()):
+            bucket = self.cells[cell]
+            del bucket[obj]
+            if not bucket:
+                del self.cells[cell]
+
+    def update(self, obj, rect=None):
+        #Call after an object moves; only touches the grid when it changed cells
+        rect = obj.rect if rect is None else rect
+        if self.object_cells.get(obj) != self._cells_for(rect):
+            self.remove(obj)
+            self.insert(obj, rect)
+
+    def clear(self):
+        self.cells.clear()
+        self.object_cells.clear()
+
+    def __contains__(self, obj):
+        return obj in self.object_cells
+
+    def __len__(self):
+        return len(self.object_cells)
+
+    def candidates(self, rect):
+        #Every object sharing a cell with rect, without exact testing, in a stable order
+        found = {}
+        for cell in self._cells_for(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        return list(found)
+
+    def query(self, rect):
+        #Objects whose rect actually overlaps rect
+        return [obj for obj in self.candidates(rect) if obj.rect.colliderect(rect)]
+
+    def nearest(self, pos, max_distance, accept=None):
+        """Object whose rect center is closest to pos among those accept(obj) allows,
+        or None if there is none within max_distance. Searches rings of cells
+        outwards from pos and stops once no unvisited cell can hold anything closer,
+        so the cost depends on how far the answer is, not on how many objects exist.
+        Once a ring has more cells than there are objects (few objects spread over a
+        big map), the objects not seen yet are checked directly instead."""
+        cs = self.cell_size
+        px, py = pos
+        cx, cy = int(px) // cs, int(py) // cs
+        best, best_d2 = None, max_distance * max_distance
+        seen = set()
+        ring = 0
+        # Everything in ring r + 1 or further is at least r cells away from pos
+        while (ring - 1) * cs <= max_distance and (best is None or ((ring - 1) * cs) ** 2 < best_d2):
+            if 8 * ring > len(self.object_cells):
+                for obj in self.object_cells:
+                    if obj in seen or (accept is not None and not accept(obj)):
+                        continue
+                    ox, oy = obj.rect.center
+                    d2 = (ox - px) ** 2 + (oy - py) ** 2
+                    if d2 < best_d2 or (d2 == best_d2 and best is None):
+                        best, best_d2 = obj, d2
+                break
+            for x in range(cx - ring, cx + ring + 1):
+                for y in (range(cy - ring, cy + ring + 1) if x in (cx - ring, cx + ring) else (cy - ring, cy + ring)):
+                    bucket = self.cells.get((x, y))
+                    if not bucket:
+                        continue
+                    for obj in bucket:
+                        if obj in seen:
+                            continue
+                        seen.add(obj)
+                        if accept is not None and not accept(obj):
+                            continue
+                        ox, oy = obj.rect.center
+                        d2 = (ox - px) ** 2 + (oy - py) ** 2
+                        if d2 < best_d2 or (d2 == best_d2 and best is None):
+                            best, best_d2 = obj, d2
+            ring += 1
+        return best
+
+    def collides(self, rect, ignore=None):
+        #True if any object other than ignore overlaps rect
+        for cell in self._cells_for(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                for obj in bucket:
+                    if obj is not ignore and obj.rect.colliderect(rect):
+                        return True
+        return False
+
+
+class PackedSpatialIndex:
+    #Read-only SpatialHash for objects that never move, packed into flat arrays (see maps.CompiledMap)
+    def __init__(self, objects, cell_size, cols, rows, starts, members):
+        """objects: what the indexes in members refer to, on a cols x rows grid of
+        cell_size cells from (0, 0). starts: cols * rows + 1 offsets into members;
+        members[starts[c]:starts[c + 1]] are the objects in cell c = cy * cols + cx.
+        Any buffers of unsigned ints work, such as a memory-mapped map sidecar."""
+        self.objects = objects
+        self.cell_size = cell_size
+        self.cols = cols
+        self.rows = rows
+        self.starts = starts
+        self.members = members
+
+    @staticmethod
+    def pack(rects, cell_size, cols, rows):
+        #(starts, members) arrays for rects, indexed by position; parts off the grid are left out
+        cells = [[] for _ in range(cols * rows)]
+        for i, rect in enumerate(rects):
+            rect = Rect(rect)
+            for cx in range(max(rect.left // cell_size, 0), min((rect.right - 1) // cell_size, cols - 1) + 1):
+                for cy in range(max(rect.top // cell_size, 0), min((rect.bottom - 1) // cell_size, rows - 1) + 1):
+                    cells[cy * cols + cx].append(i)
+        starts, members = array("I", [0]), array("I")
+        for bucket in cells:
+            members.extend(bucket)
+            starts.append(len(members))
+        return starts, members
+
+    def _cells_for(self, rect):
+        # Same cells and order as SpatialHash._cells_for, limited to the grid
+        cs = self.cell_size
+        x0, x1 = max(rect.left // cs, 0), min((rect.right - 1) // cs, self.cols - 1)
+        y0, y1 = max(rect.top // cs, 0), min((rect.bottom - 1) // cs, self.rows - 1)
+        return [cy * self.cols + cx for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def __len__(self):
+        return len(self.objects)
+
+    def cell_members(self, cell):
+        #Indexes of the objects in grid cell (cx, cy); none outside the grid
+        cx, cy = cell
+        if 0 <= cx < self.cols and 0 <= cy < self.rows:
+            c = cy * self.cols + cx
+            return self.members[self.starts[c]:self.starts[c + 1]]
+        return ()
+
+    def candidates(self, rect):
+        #Every object sharing a cell with rect, without exact testing, in a stable order
+        found = {}
+        starts, members, objects = self.starts, self.members, self.objects
+        for cell in self._cells_for(rect):
+            for i in members[starts[cell]:starts[cell + 1]]:
+                found[objects[i]] = None
+        return list(found)
+
+    def query(self, rect):
+        #Objects whose rect actually overlaps rect
+        return [obj for obj in self.candidates(rect) if obj.rect.colliderect(rect)]
+
+    def collides(self, rect, ignore=None):
+        #True if any object other than ignore overlaps rect
+        starts, members, objects = self.starts, self.members, self.objects
+        for cell in self._cells_for(rect):
+            for i in members[starts[cell]:starts[cell + 1]]:
+                obj = objects[i]
+                if obj is not ignore and obj.rect.colliderect(rect):
+                    return True
+        return False
+
+
+def sweep_rect(x, y, dx, dy, size, rect):
+    """Earliest time t in [0, 1) at which a size x size box moving from (x, y) by
+    (dx, dy) overlaps rect, or None if it never does. Overlap is strict like
+    Rect.colliderect, so t is 0 when the box already overlaps at its start and
+    the end position is covered too (it is just the t -> 1 end of the sweep)."""
+    enter, leave = -math.inf, math.inf
+    for pos, delta, lo, hi in ((x, dx, rect.left - size, rect.right), (y, dy, rect.top - size, rect.bottom)):
+        if delta == 0:
+            if not lo < pos < hi:
+                return None
+        else:
+            t1 = (lo - pos) / delta
+            t2 = (hi - pos) / delta
+            if t1 > t2:
+                t1, t2 = t2, t1
+            enter = max(enter, t1)
+            leave = min(leave, t2)
+    if enter < leave and enter < 1 and leave > 0:
+        return max(enter, 0.0)
+    return None
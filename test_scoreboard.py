@@ -0,0 +1,92 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from scoreboard import Scoreboard, ScoreWriter
+
+
+class PrefixSearchTest(unittest.TestCase):
+    #Scoreboard.search()/count_prefix() find names by prefix whatever the case of either
+    NAMES = ["Zed", "zara", "Liz", "LiZa", "lizzy", "Lima", "[bot]", "_ghost", "@home", "@Alex"]
+
+    def setUp(self):
+        self.board = Scoreboard(":memory:")
+        self.board.record((name, "Other", name, 1) for name in self.NAMES)
+
+    def tearDown(self):
+        self.board.close()
+
+    def found(self, prefix):
+        names = [name for name, _, _ in self.board.search(prefix, 100)]
+        self.assertEqual(self.board.count_prefix(prefix), len(names))
+        return sorted(names)
+
+    def test_prefix_ending_in_z_either_case(self):
+        self.assertEqual(self.found("Z"), ["Zed", "zara"])
+        self.assertEqual(self.found("z"), ["Zed", "zara"])
+
+    def test_mixed_case_prefix(self):
+        for prefix in ("LiZ", "liz", "LIZ", "lIz"):
+            self.assertEqual(self.found(prefix), ["LiZa", "Liz", "lizzy"])
+        self.assertEqual(self.found("LI"), ["LiZa", "Lima", "Liz", "lizzy"])
+
+    def test_prefix_ending_before_letters(self):
+        # "[" and "_" sort between the uppercase and lowercase letters but aren't after "@"
+        self.assertEqual(self.found("@"), ["@Alex", "@home"])
+        self.assertEqual(self.found("@a"), ["@Alex"])
+
+    def test_empty_prefix(self):
+        self.assertEqual(self.board.search("", 10), [])
+        self.assertEqual(self.board.count_prefix(""), 0)
+
+
+class ScoreWriterTest(unittest.TestCase):
+    #Results the writer can't save are kept for the next run, and flush()/close() never hang
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "scores.db")
+        self.stderr = contextlib.redirect_stderr(io.StringIO())
+        self.stderr.__enter__()
+
+    def tearDown(self):
+        self.stderr.__exit__(None, None, None)
+        self.dir.cleanup()
+
+    def points(self, name):
+        board = Scoreboard(self.path)
+        try:
+            return board.get(name)
+        finally:
+            board.close()
+
+    def test_unopenable_database_keeps_results_for_next_writer(self):
+        os.mkdir(self.path)  # a directory where the database should be: it can't be opened
+        writer = ScoreWriter(self.path, retry_delay=0.01)
+        writer.submit([("Ann", "Bob", "Ann", 3)])
+        writer.flush()
+        writer.close()
+        self.assertTrue(os.path.exists(writer.pending_path))
+
+        os.rmdir(self.path)
+        writer = ScoreWriter(self.path, retry_delay=0.01)
+        writer.submit([("Ann", "Bob", None, 0)])
+        writer.flush()
+        writer.close()
+        self.assertEqual(self.points("Ann"), (15, 3))
+        self.assertFalse(os.path.exists(writer.pending_path))
+
+    def test_dead_writer_does_not_hang(self):
+        writer = ScoreWriter(self.path, max_pending=1)
+        writer._put(None)  # stops the thread, as if it had died
+        writer._thread.join()
+        for _ in range(3):
+            writer.submit([("Ann", "Bob", "Bob", 1)])
+        writer.flush()
+        writer.close()
+        self.assertEqual(len(writer._load_pending()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
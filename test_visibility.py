@@ -0,0 +1,52 @@
+import os
+import random
+import unittest
+
+from pygame import Rect
+
+from maps import GameMap
+from visibility import Visibility
+
+MAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+
+
+class TablelessVisibilityTest(unittest.TestCase):
+    #Without a table (big maps), visible() agrees with clipline() against every obstacle
+    def check(self, obstacles, width, height, segments):
+        vis = Visibility(obstacles, width, height, 100, max_cells=0)
+        self.assertIsNone(vis.table)
+        for a, b in segments:
+            expected = not any(ob.clipline(a, b) for ob in obstacles)
+            self.assertEqual(vis.visible(a, b), expected, f"{a} -> {b}")
+
+    def random_segments(self, width, height, count, seed):
+        rng = random.Random(seed)
+        segments = []
+        for k in range(count):
+            if k % 3 == 0:
+                # On grid lines and corners, where cells meet
+                segments.append(((rng.randrange(width // 100 + 1) * 100, rng.randrange(height // 100 + 1) * 100),
+                                 (rng.randrange(width // 100 + 1) * 100, rng.randrange(height // 100 + 1) * 100)))
+            elif k % 3 == 1:
+                segments.append(((rng.randrange(width), rng.randrange(height)),
+                                 (rng.randrange(width), rng.randrange(height))))
+            else:
+                segments.append(((rng.uniform(0, width), rng.uniform(0, height)),
+                                 (rng.uniform(0, width), rng.uniform(0, height))))
+        return segments
+
+    def test_maps(self):
+        for name in ("easy.json", "medium.json", "hard.json"):
+            game_map = GameMap.load(os.path.join(MAP_DIR, name)).tiled(2400, 1800)
+            segments = [((378, 311), (900, 253))] + self.random_segments(2400, 1800, 20000, name)
+            self.check(game_map.obstacles, 2400, 1800, segments)
+
+    def test_random_obstacles(self):
+        rng = random.Random(1)
+        obstacles = [Rect(rng.randrange(3000), rng.randrange(3000), rng.randrange(1, 300), rng.randrange(1, 300))
+                     for _ in range(300)]
+        self.check(obstacles, 3000, 3000, self.random_segments(3000, 3000, 20000, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import math
+import multiprocessing
+import random
+from collections import defaultdict
+
+FORMATS = ("round-robin", "swiss", "single-elim")
+
+
+class MatchResult:
+    #Outcome of one headless match, small enough to send back from a worker process
+    def __init__(self, players, winner, remaining_hp, frames, seed):
+        self.players = players  # (player 1 name, player 2 name)
+        self.winner = winner  # a name, or None for a draw
+        self.remaining_hp = remaining_hp  # winner's hp, 0 for a draw
+        self.frames = frames
+        self.seed = seed
+
+    def __repr__(self):
+        outcome = self.winner or "draw"
+        return f"MatchResult({self.players[0]} vs {self.players[1]}: {outcome}, seed={self.seed})"
+
+
+def round_robin(players):
+    #Every pairing once; all of them can run in parallel as a single round
+    return [[(a, b) for i, a in enumerate(players) for b in players[i + 1:]]]
+
+
+def swiss_pairings(players, points, played):
+    #Pair players with equal or close points, avoiding rematches where possible
+    order = sorted(players, key=lambda p: -points[p])
+    pairs = []
+    while len(order) > 1:
+        a = order.pop(0)
+        partner = next((b for b in order if (a, b) not in played and (b, a) not in played), order[0])
+        order.remove(partner)
+        pairs.append((a, partner))
+    return pairs  # with an odd count the last player sits out (a bye)
+
+
+class Tournament:
+    #Runs a bracket of headless matches on a multiprocessing pool, one match per task
+    def __init__(self, players, fmt, run_match, processes=None, base_seed=0, rounds=None):
+        """players: player names, fmt: one of FORMATS,
+        run_match: picklable function (player1, player2, seed) -> MatchResult,
+        processes: pool size (all cores by default),
+        rounds: number of Swiss rounds, ceil(log2(players)) by default"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown tournament format {fmt!r}, expected one of {FORMATS}")
+        if len(players) < 2:
+            raise ValueError("A tournament needs at least two players")
+        self.players = list(players)
+        self.fmt = fmt
+        self.run_match = run_match
+        self.processes = processes
+        self.rng = random.Random(base_seed)
+        self.rounds = rounds or max(1, math.ceil(math.log2(len(players))))
+        self.results = []
+        self.points = defaultdict(int)
+
+    def _play_round(self, pool, pairs):
+        # Seeds are drawn in the parent so a tournament is reproducible from base_seed
+        tasks = [(a, b, self.rng.randrange(2 ** 32)) for a, b in pairs]
+        results = pool.starmap(self.run_match, tasks, chunksize=1)
+        for result in results:
+            if result.winner is None:
+                for name in result.players:
+                    self.points[name] += 1
+            else:
+                self.points[result.winner] += 2
+        self.results += results
+        return results
+
+    def run(self):
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            if self.fmt == "round-robin":
+                for pairs in round_robin(self.players):
+                    self._play_round(pool, pairs)
+            elif self.fmt == "swiss":
+                played = set()
+                for _ in range(self.rounds):
+                    pairs = swiss_pairings(self.players, self.points, played)
+                    played.update(pairs)
+                    self._play_round(pool, pairs)
+            else:
+                self._single_elimination(pool)
+        finally:
+            # close/join rather than the context manager's terminate(): SDL turns the
+            # SIGTERM into a quit event inside workers that have initialised pygame
+            pool.close()
+            pool.join()
+        return self.results
+
+    def _single_elimination(self, pool):
+        alive = list(self.players)
+        while len(alive) > 1:
+            pairs = [(alive[i], alive[i + 1]) for i in range(0, len(alive) - 1, 2)]
+            byes = alive[len(pairs) * 2:]
+            winners = [None] * len(pairs)
+            pending = list(range(len(pairs)))
+            # Drawn matches are replayed with a new seed, up to three times, then the higher seed advances
+            for attempt in range(3):
+                if not pending:
+                    break
+                results = self._play_round(pool, [pairs[i] for i in pending])
+                for i, result in zip(list(pending), results):
+                    if result.winner is not None:
+                        winners[i] = result.winner
+                        pending.remove(i)
+            for i in pending:
+                winners[i] = pairs[i][0]
+            alive = winners + byes
+
+    def standings(self):
+        #(name, points) best first, ties broken by name for a stable order
+        return sorted(((p, self.points[p]) for p in self.players), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,272 @@
+import math
+
+import numpy as np
+
+from bullet_engine import round_rect_coord, sweep_boxes
+from controllers import UP, DOWN, LEFT, RIGHT, SHOOT
+
+NO_WINNER, DRAW = -1, 2
+
+
+def _movement_table(speed):
+    """Per 4-bit movement mask: (moving, dx, dy, heading angle) exactly as
+    Tank.handle_input() computes them with Vector2 and math"""
+    table = []
+    for mask in range(16):
+        x = (1 if mask & RIGHT else 0) - (1 if mask & LEFT else 0)
+        y = (1 if mask & DOWN else 0) - (1 if mask & UP else 0)
+        if x == 0 and y == 0:
+            table.append((False, 0.0, 0.0, 0.0))
+            continue
+        length = math.sqrt(x * x + y * y)
+        x, y = x / length, y / length
+        table.append((True, x * speed, y * speed, math.degrees(math.atan2(-y, x)) % 360))
+    return table
+
+
+class VecTankEnv:
+    #K independent two-tank matches on one layout, stepped together in batched NumPy arrays
+    def __init__(self, game, settings, num_envs, max_frames=None, bullet_capacity=32):
+        """game: a Game after restart(), whose obstacles, spawn points and safe zone
+        every arena copies, settings: the Settings class, num_envs: K arenas,
+        max_frames: ticks before an undecided match is cut off (None never cuts)
+
+        Simulates the rules of Game.step() without powerups and cheats: movement
+        blocked by walls, obstacles and the other tank, shooting with reload,
+        swept bullets and the shrinking safe zone."""
+        self.num_envs = num_envs
+        self.max_frames = max_frames
+        self.width, self.height = game.world_rect.size
+        self.tank_w, self.tank_h = game.tanks[0].rect.size
+        self.tank_hp = settings.TANK_HP
+        self.bullet_size = settings.BULLET_SIZE
+        self.bullet_speed = settings.BULLET_SPEED
+        self.bullet_cooldown = settings.BULLET_COOLDOWN
+        self.tick_rate = settings.TICK_RATE
+        self.swept = settings.SWEPT_COLLISION
+        self.shrink_interval = game.shrink_interval
+        self.start_radius = math.hypot(*game.world_rect.size) / 2
+        self.zone_x, self.zone_y = game.safe_zone_center
+        self.obstacles = np.array([tuple(ob.rect) for ob in game.obstacles], dtype=np.int64).reshape(-1, 4)
+        self.spawn = np.array([t.rect.topleft for t in game.tanks[:2]], dtype=np.int64)
+
+        # Headings are indexes into self.angles; index 0 is angle 0, the spawn heading
+        moves = _movement_table(settings.TANK_SPEED)
+        self.angles = sorted({angle for _, _, _, angle in moves})
+        self.move_on = np.array([m[0] for m in moves])
+        self.move_dx = np.array([m[1] for m in moves])
+        self.move_dy = np.array([m[2] for m in moves])
+        self.move_heading = np.array([self.angles.index(m[3]) for m in moves])
+        # Muzzle offset and bullet velocity per heading, as in Tank._shoot()
+        rads = [math.radians(a) for a in self.angles]
+        self.muzzle_x = np.array([math.cos(r) * 40 for r in rads])
+        self.muzzle_y = np.array([-math.sin(r) * 40 for r in rads])
+        self.shot_vx = np.array([math.cos(r) * self.bullet_speed for r in rads])
+        self.shot_vy = np.array([-math.sin(r) * self.bullet_speed for r in rads])
+
+        k = num_envs
+        # Tank state, [arena, tank]
+        self.tank_x = np.zeros((k, 2), dtype=np.int64)  # rect top-left
+        self.tank_y = np.zeros((k, 2), dtype=np.int64)
+        self.heading = np.zeros((k, 2), dtype=np.int64)
+        self.hp = np.zeros((k, 2), dtype=np.int64)
+        self.reload = np.zeros((k, 2), dtype=np.int64)
+        self.zone_cooldown = np.zeros((k, 2), dtype=np.int64)
+        # Bullets, [arena, slot]; each arena's live bullets are packed into its first count slots
+        self.count = np.zeros(k, dtype=np.int64)
+        self.bullet_x = np.zeros((k, bullet_capacity), dtype=np.int64)
+        self.bullet_y = np.zeros((k, bullet_capacity), dtype=np.int64)
+        self.bullet_vx = np.zeros((k, bullet_capacity), dtype=np.float64)
+        self.bullet_vy = np.zeros((k, bullet_capacity), dtype=np.float64)
+        self.bullet_owner = np.zeros((k, bullet_capacity), dtype=np.int64)
+        # Match state, [arena]
+        self.radius = np.zeros(k, dtype=np.float64)
+        self.shrink_timer = np.zeros(k, dtype=np.int64)
+        self.shrinking = np.zeros(k, dtype=bool)
+        self.frame = np.zeros(k, dtype=np.int64)
+
+    BULLET_ARRAYS = ("bullet_x", "bullet_y", "bullet_vx", "bullet_vy", "bullet_owner")
+
+    def reset(self, arenas=None):
+        #Put every arena (or the given arena indexes) back to the start of a match
+        if arenas is None:
+            arenas = np.arange(self.num_envs)
+        self.tank_x[arenas] = self.spawn[:, 0]
+        self.tank_y[arenas] = self.spawn[:, 1]
+        self.heading[arenas] = 0
+        self.hp[arenas] = self.tank_hp
+        self.reload[arenas] = 0
+        self.zone_cooldown[arenas] = 0
+        self.count[arenas] = 0
+        self.radius[arenas] = self.start_radius
+        self.shrink_timer[arenas] = 0
+        self.shrinking[arenas] = False
+        self.frame[arenas] = 0
+        return self.observe()
+
+    def observe(self):
+        """Observation arrays:
+        tanks: [K, 2, 6] center x, center y, heading angle, hp, reload ticks, safe zone cooldown
+        bullets: [K, capacity, 5] x, y, vx, vy, owner; only the first bullet_count slots are live
+        bullet_count: [K], safe_zone: [K, 2] radius and 1.0 while shrinking"""
+        tanks = np.stack([self.tank_x + self.tank_w // 2, self.tank_y + self.tank_h // 2,
+                          np.asarray(self.angles)[self.heading], self.hp, self.reload, self.zone_cooldown],
+                         axis=-1).astype(np.float32)
+        bullets = np.stack([getattr(self, name) for name in self.BULLET_ARRAYS], axis=-1).astype(np.float32)
+        return {
+            "tanks": tanks,
+            "bullets": bullets,
+            "bullet_count": self.count.copy(),
+            "safe_zone": np.stack([self.radius, self.shrinking], axis=-1).astype(np.float32),
+        }
+
+    def step(self, actions):
+        """Advance every arena by one tick.
+
+        actions: [K, 2] control bitmasks (UP | DOWN | LEFT | RIGHT | SHOOT) per tank.
+        Returns (observation, reward [K, 2], done [K], info). The reward is the hp
+        the opponent lost minus the hp the tank lost this tick. Finished arenas are
+        reset straight away; info["winner"] holds 0, 1, DRAW or NO_WINNER (still
+        playing or cut off at max_frames) and info["frames"] each match's length."""
+        actions = np.asarray(actions, dtype=np.int64)
+        hp_before = self.hp.copy()
+        for i in range(2):
+            self._handle_input(i, actions[:, i])
+        killed = self._update()
+        self.frame += 1
+
+        lost = hp_before - self.hp
+        reward = (lost[:, ::-1] - lost).astype(np.float32)
+        winner = self._winner(killed)
+        done = winner != NO_WINNER
+        if self.max_frames is not None:
+            done |= self.frame >= self.max_frames
+        info = {"winner": winner, "frames": self.frame.copy()}
+        if done.any():
+            self.reset(np.flatnonzero(done))
+        return self.observe(), reward, done, info
+
+    def _handle_input(self, i, mask):
+        # Tank.handle_input() for tank i of every arena; tanks move one after the other like in Game.step()
+        move = mask & (UP | DOWN | LEFT | RIGHT)
+        moving = self.move_on[move]
+        self.heading[moving, i] = self.move_heading[move][moving]
+
+        # Rect.center = Vector2 rounds the new center, then the rect is placed around it
+        w, h = self.tank_w, self.tank_h
+        cx = self.tank_x[:, i] + w // 2
+        cy = self.tank_y[:, i] + h // 2
+        new_x = round_rect_coord(cx + self.move_dx[move]) - w // 2
+        new_y = round_rect_coord(cy + self.move_dy[move]) - h // 2
+        blocked = ~((0 <= new_x) & (new_x + w <= self.width) & (0 <= new_y) & (new_y + h <= self.height))
+        ob = self.obstacles
+        if len(ob):
+            blocked |= ((new_x[:, None] < ob[:, 0] + ob[:, 2]) & (ob[:, 0] < new_x[:, None] + w) &
+                        (new_y[:, None] < ob[:, 1] + ob[:, 3]) & (ob[:, 1] < new_y[:, None] + h)).any(axis=1)
+        ox, oy = self.tank_x[:, 1 - i], self.tank_y[:, 1 - i]
+        blocked |= (new_x < ox + w) & (ox < new_x + w) & (new_y < oy + h) & (oy < new_y + h)
+        blocked &= moving
+
+        go = moving & ~blocked
+        self.tank_x[go, i] = new_x[go]
+        self.tank_y[go, i] = new_y[go]
+        # A blocked move returns before the shoot check
+        shooters = np.flatnonzero((mask & SHOOT != 0) & (self.reload[:, i] == 0) & ~blocked)
+        if len(shooters):
+            self._shoot(shooters, i)
+
+    def _shoot(self, arenas, i):
+        # Tank._shoot() without powerups fires its main shot plus the "normal single bullet"
+        heading = self.heading[arenas, i]
+        x = np.trunc(self.tank_x[arenas, i] + self.tank_w // 2 + self.muzzle_x[heading]).astype(np.int64)
+        y = np.trunc(self.tank_y[arenas, i] + self.tank_h // 2 + self.muzzle_y[heading]).astype(np.int64)
+        while self.count[arenas].max() + 2 > self.bullet_x.shape[1]:
+            self._grow()
+        for _ in range(2):
+            slot = self.count[arenas]
+            self.bullet_x[arenas, slot] = x
+            self.bullet_y[arenas, slot] = y
+            self.bullet_vx[arenas, slot] = self.shot_vx[heading]
+            self.bullet_vy[arenas, slot] = self.shot_vy[heading]
+            self.bullet_owner[arenas, slot] = i
+            self.count[arenas] += 1
+        self.reload[arenas, i] = self.bullet_cooldown
+
+    def _grow(self):
+        for name in self.BULLET_ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((old.shape[0], old.shape[1] * 2), dtype=old.dtype)
+            new[:, :old.shape[1]] = old
+            setattr(self, name, new)
+
+    def _update(self):
+        # Game.update() and Tank.update() for every arena at once
+        self.shrink_timer += 1
+        start = ~self.shrinking & (self.shrink_timer >= self.shrink_interval)
+        self.shrinking |= start
+        self.shrink_timer[start] = 0
+        self.radius[self.shrinking] = np.maximum(50, self.radius[self.shrinking] - 0.1)
+
+        for timer in (self.zone_cooldown, self.reload):
+            timer -= timer > 0
+        self._update_bullets()
+        # Tank 1 dying to tank 0's bullets decides the match before the safe zone can;
+        # tank 0 dying to tank 1's bullets is only noticed after it
+        killed = self.hp[:, 1] <= 0
+
+        dx = self.tank_x + self.tank_w // 2 - self.zone_x
+        dy = self.tank_y + self.tank_h // 2 - self.zone_y
+        outside = np.sqrt(dx * dx + dy * dy) > self.radius[:, None]
+        burn = outside & (self.hp > 0) & (self.zone_cooldown <= 0)
+        self.hp -= burn
+        self.zone_cooldown[burn] = self.tick_rate
+        return killed
+
+    def _update_bullets(self):
+        # Bullet.update() plus the hit tests in Tank.update() for every live bullet of every arena
+        arena, slot = np.nonzero(np.arange(self.bullet_x.shape[1]) < self.count[:, None])
+        if len(arena) == 0:
+            return
+        x, y = self.bullet_x[arena, slot], self.bullet_y[arena, slot]
+        new_x = round_rect_coord(x + self.bullet_vx[arena, slot])
+        new_y = round_rect_coord(y + self.bullet_vy[arena, slot])
+        self.bullet_x[arena, slot] = new_x
+        self.bullet_y[arena, slot] = new_y
+        if self.swept:
+            sx, sy, dx, dy = x, y, new_x - x, new_y - y
+        else:
+            sx, sy, dx, dy = new_x, new_y, np.zeros_like(new_x), np.zeros_like(new_y)
+
+        s = self.bullet_size
+        victim = 1 - self.bullet_owner[arena, slot]
+        tank_time = sweep_boxes(sx, sy, dx, dy, s, self.tank_x[arena, victim], self.tank_y[arena, victim],
+                                self.tank_w, self.tank_h)
+        ob = self.obstacles
+        if len(ob):
+            obstacle_time = sweep_boxes(sx[:, None], sy[:, None], dx[:, None], dy[:, None], s,
+                                        ob[:, 0], ob[:, 1], ob[:, 2], ob[:, 3]).min(axis=1)
+        else:
+            obstacle_time = np.full(len(arena), np.inf)
+        off_screen = (new_x + s < 0) | (new_x > self.width) | (new_y + s < 0) | (new_y > self.height)
+        # A tank reached before any wall takes the hit
+        hit = tank_time < obstacle_time
+        self.hp -= np.bincount(arena[hit] * 2 + victim[hit], minlength=2 * self.num_envs).reshape(-1, 2)
+
+        remove = hit | off_screen | np.isfinite(obstacle_time)
+        if remove.any():
+            keep = np.arange(self.bullet_x.shape[1]) < self.count[:, None]
+            keep[arena[remove], slot[remove]] = False
+            order = np.argsort(~keep, axis=1, kind="stable")
+            for name in self.BULLET_ARRAYS:
+                setattr(self, name, np.take_along_axis(getattr(self, name), order, axis=1))
+            self.count = keep.sum(axis=1)
+
+    def _winner(self, killed):
+        # The end-of-update checks in Game.update()
+        dead0, dead1 = self.hp[:, 0] <= 0, self.hp[:, 1] <= 0
+        winner = np.where(killed, 0, NO_WINNER)
+        open_ = winner == NO_WINNER
+        winner[open_ & dead0 & dead1] = DRAW
+        winner[open_ & dead0 & ~dead1] = 1
+        winner[open_ & dead1 & ~dead0] = 0
+        return winner
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+
+from pygame import Rect
+
+
+BLOCKED = -1  # table value for cell pairs no segment between gets through
+
+
+def layout_hash(obstacles, width, height, cell_size):
+    #Short stable hash of an obstacle layout, used to name its cached table on disk
+    key = repr((sorted(tuple(r) for r in obstacles), width, height, cell_size))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _hull(points):
+    # Convex hull (Andrew's monotone chain), counter-clockwise in y-up terms
+    points = sorted(set(points))
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def _hull_touches(hull, rect):
+    # Separating axis test between a convex polygon and a rect; touching counts as overlap
+    corners = ((rect.left, rect.top), (rect.right, rect.top), (rect.left, rect.bottom), (rect.right, rect.bottom))
+    for i, (x1, y1) in enumerate(hull):
+        x2, y2 = hull[(i + 1) % len(hull)]
+        if all((x2 - x1) * (cy - y1) - (y2 - y1) * (cx - x1) < 0 for cx, cy in corners):
+            return False
+    return True
+
+
+def _separates(ob, a, b):
+    # True if every segment from cell a to cell b (edges included) has to cross ob:
+    # ob lies strictly between the cells on one axis and spans both on the other
+    for a_lo, a_hi, b_lo, b_hi, ob_lo, ob_hi, span, cover in (
+            (a.left, a.right, b.left, b.right, ob.left, ob.right - 1,
+             (min(a.top, b.top), max(a.bottom, b.bottom)), (ob.top, ob.bottom - 1)),
+            (a.top, a.bottom, b.top, b.bottom, ob.top, ob.bottom - 1,
+             (min(a.left, b.left), max(a.right, b.right)), (ob.left, ob.right - 1))):
+        between = (a_hi < ob_lo and ob_hi < b_lo) or (b_hi < ob_lo and ob_hi < a_lo)
+        if between and cover[0] <= span[0] and span[1] <= cover[1]:
+            return True
+    return False
+
+
+class Visibility:
+    #"Can A see B" against static obstacles: a coarse cell-to-cell table plus one exact segment test
+    # layout hash -> Visibility, so every match on a map shares one table
+    cache = {}
+    WALK_MARGIN = 2  # pixels around a segment whose cells the table-less walk checks (see _walk)
+
+    @classmethod
+    def for_layout(cls, obstacles, width, height, cell_size, cache_dir=None, max_cells=None, index=None):
+        """Table for this layout from memory, from cache_dir on disk, or freshly
+        computed (and then written to cache_dir). cache_dir None keeps it in memory."""
+        key = layout_hash(obstacles, width, height, cell_size)
+        vis = cls.cache.get(key)
+        if vis is None:
+            vis = cls.cache[key] = cls(obstacles, width, height, cell_size, cache_dir, max_cells, index, key)
+        return vis
+
+    def __init__(self, obstacles, width, height, cell_size, cache_dir=None, max_cells=None, index=None, key=None):
+        """max_cells: the table has an entry per pair of cells, so above this many cells
+        (big maps) there is no table and every query walks the cells along the segment.
+        index: a PackedSpatialIndex of obstacles with the same cell size, walked
+        instead of bucketing the obstacles again (a compiled map's, see maps.py)."""
+        self.obstacles = [Rect(r) for r in obstacles]
+        self.cell_size = cell_size
+        self.cols = max(1, -(-width // cell_size))
+        self.rows = max(1, -(-height // cell_size))
+        self.key = key or layout_hash(obstacles, width, height, cell_size)
+        self.hits = 0  # queries the table answered on its own
+        self.misses = 0  # queries that needed the exact segment test
+        self.loaded = False  # True when the table came from disk
+
+        if max_cells is not None and self.cols * self.rows > max_cells:
+            self.table = None
+            if index is not None and index.cell_size == cell_size:
+                self.cell_obstacles = index.cell_members
+                return
+            # Obstacle indexes per cell they overlap, for the walk along a segment
+            buckets = {}
+            for i, ob in enumerate(self.obstacles):
+                for cx in range(ob.left // cell_size, (ob.right - 1) // cell_size + 1):
+                    for cy in range(ob.top // cell_size, (ob.bottom - 1) // cell_size + 1):
+                        buckets.setdefault((cx, cy), []).append(i)
+            self.cell_obstacles = lambda cell: buckets.get(cell, ())
+            return
+
+        path = os.path.join(cache_dir, f"{self.key}.json") if cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    self.table = json.load(file)["table"]
+                self.loaded = len(self.table) == (self.cols * self.rows) ** 2
+            except (OSError, ValueError, KeyError):
+                pass
+        if not self.loaded:
+            self.table = self._build_table()
+            if path:
+                self._save(path)
+
+    def _build_table(self):
+        """For every ordered pair of cells, BLOCKED when one obstacle cuts every
+        segment between them, else a bitmask of the obstacles touching the convex
+        hull of the two cells: 0 means every segment between them is clear,
+        otherwise only the obstacles in the mask can block one."""
+        cs = self.cell_size
+        n = self.cols * self.rows
+        cells = [Rect((i % self.cols) * cs, (i // self.cols) * cs, cs, cs) for i in range(n)]
+        table = [0] * (n * n)
+        for a in range(n):
+            for b in range(a, n):
+                ra, rb = cells[a], cells[b]
+                union = ra.union(rb)
+                hull = _hull([ra.topleft, ra.topright, ra.bottomleft, ra.bottomright,
+                              rb.topleft, rb.topright, rb.bottomleft, rb.bottomright])
+                mask = 0
+                for i, ob in enumerate(self.obstacles):
+                    if _separates(ob, ra, rb):
+                        mask = BLOCKED
+                        break
+                    # Bounding box first, it rejects most obstacles
+                    if (ob.left <= union.right and union.left <= ob.right and ob.top <= union.bottom and
+                            union.top <= ob.bottom and _hull_touches(hull, ob)):
+                        mask |= 1 << i
+                table[a * n + b] = table[b * n + a] = mask
+        return table
+
+    def _save(self, path):
+        # Written to a temporary name first so a concurrent reader never sees half a file
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump({"cell_size": self.cell_size, "cols": self.cols, "rows": self.rows, "table": self.table}, file)
+        os.replace(tmp, path)
+
+    def _cell(self, pos):
+        # None outside the grid, where the table can't vouch for anything
+        x, y = int(pos[0]) // self.cell_size, int(pos[1]) // self.cell_size
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return y * self.cols + x
+        return None
+
+    def _walk(self, a, b):
+        """Obstacle indexes in the cells the segment a-b can touch, nearest cells first.
+        Rect.clipline() truncates the points to whole pixels and tests the pixel line
+        between them, which can stray a pixel or so off the exact segment, so every cell
+        within WALK_MARGIN pixels of it is included. The segment is cut into one band per
+        grid line along its longer axis; each band's cells come straight from where the
+        segment enters and leaves it, with no stepping error to pile up on long segments."""
+        cs, margin = self.cell_size, self.WALK_MARGIN
+        (x0, y0), (x1, y1) = a, b
+        steep = abs(y1 - y0) > abs(x1 - x0)
+        if steep:
+            # Walk along y instead; u is the long axis, v the short one
+            x0, y0, x1, y1 = y0, x0, y1, x1
+        bands, lines = (self.rows, self.cols) if steep else (self.cols, self.rows)
+        slope = (y1 - y0) / (x1 - x0) if x1 != x0 else 0.0
+        lo, hi = min(x0, x1) - margin, max(x0, x1) + margin
+        step = 1 if x1 >= x0 else -1
+        first, last = (min(bands - 1, max(0, int(u // cs))) for u in ((lo, hi) if step > 0 else (hi, lo)))
+        down = y1 >= y0
+        cell_obstacles = self.cell_obstacles
+        seen = set()
+        for u in range(first, last + step, step):
+            # Where the segment is while it crosses band u, widened by the margin
+            u_lo, u_hi = u * cs - margin, u * cs + cs + margin
+            if u_lo < lo:
+                u_lo = lo
+            if u_hi > hi:
+                u_hi = hi
+            if u_lo > u_hi:
+                continue
+            v_a, v_b = y0 + slope * (u_lo - x0), y0 + slope * (u_hi - x0)
+            if v_a > v_b:
+                v_a, v_b = v_b, v_a
+            v_lo, v_hi = max(0, int((v_a - margin) // cs)), min(lines - 1, int((v_b + margin) // cs))
+            for v in (range(v_lo, v_hi + 1) if down else range(v_hi, v_lo - 1, -1)):
+                for i in cell_obstacles((v, u) if steep else (u, v)):
+                    if i not in seen:
+                        seen.add(i)
+                        yield i
+
+    def visible(self, a, b):
+        #True if the segment between points a and b crosses no obstacle
+        if self.table is None:
+            # Exact test against the obstacles along the way only
+            self.misses += 1
+            return not any(self.obstacles[i].clipline(a, b) for i in self._walk(a, b))
+        ca, cb = self._cell(a), self._cell(b)
+        if ca is None or cb is None:
+            mask = (1 << len(self.obstacles)) - 1
+        else:
+            mask = self.table[ca * self.cols * self.rows + cb]
+        if mask <= 0:
+            self.hits += 1
+            return mask == 0
+        self.misses += 1
+        i = 0
+        while mask:
+            if mask & 1 and self.obstacles[i].clipline(a, b):
+                return False
+            mask >>= 1
+            i += 1
+        return True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "loaded_from_disk": self.loaded}